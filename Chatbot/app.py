@@ -1,17 +1,24 @@
 import gradio as gr
 import traceback
-from Chatbot.bot import answer_query
+from Chatbot.bot import astream_query
+from Chatbot.startup import warmup
 
-def chat_fn(message, history):
+async def chat_fn(message, history):
+    # Streams the answer into the last chat bubble as tokens arrive
+    history.append((message, ""))
+    answer = ""
     try:
-        answer = answer_query(message)
+        async for delta in astream_query(message):
+            answer += delta
+            history[-1] = (message, answer)
+            yield "", history
         if not answer:
             answer = "I couldn’t process that. Please try rephrasing your question."
     except Exception:
         traceback.print_exc()
         answer = "Something went wrong while processing your request."
-    history.append((message, answer))
-    return "", history
+    history[-1] = (message, answer)
+    yield "", history
 
 with gr.Blocks(
     theme=gr.themes.Soft(),
@@ -27,4 +34,6 @@ with gr.Blocks(
         show_label=False
     )
     msg.submit(chat_fn, [msg, chatbot], [msg, chatbot])
+# Models and indexes are loaded before the UI accepts messages
+warmup()
 demo.launch()
@@ -1,28 +1,45 @@
 # Main program...Combines all modules
 
+import os
 import re
-from Chatbot.router import route_query
-from helpers.live_sources import retrieve_live_sources
+import asyncio
+from Chatbot.router import route_query, aroute_query
+from helpers.request_context import QueryContext
 from dotenv import load_dotenv
 load_dotenv()
 HIGH_CONF = 0.75
 LOW_CONF = 0.45
 LINK_RELEVANCE_MIN = 0.01
 RELEVANCE_CLOSE_DELTA = 0.10
+# One router call also extracts live-data entities
+FUSED_ROUTING = os.getenv("FUSED_ROUTING", "0") == "1"
+# Speculative mode: start close-ranked modules together (async pipeline only)
+SPECULATIVE_MODULES = os.getenv("SPECULATIVE_MODULES", "0") == "1"
+SPECULATIVE_DELTA = 0.15
+SPECULATIVE_MAX = 3
 
 # Calling different modules
-def call_railway_rag(query):
+def call_railway_rag(ctx):
     from modules.railway_rag.railway_base_rag import answer_with_rag
-    return answer_with_rag(query)
-def call_live_data(query):
+    return answer_with_rag(ctx.query, ctx)
+def call_live_data(ctx):
     from modules.live_data_apis import answer_with_live_data
-    return answer_with_live_data(query)
-def call_general(query,route,mode="module"):
+    return answer_with_live_data(ctx.query, parsed=ctx.entities)
+def call_general(ctx,mode="module"):
     from modules.general_chat import answer_general_query
-    return answer_general_query(query,route,mode)
-def call_link_answer(query, num_of_links):
+    return answer_general_query(ctx.query,ctx.route,mode)
+async def acall_railway_rag(ctx):
+    from modules.railway_rag.railway_base_rag import aanswer_with_rag
+    return await aanswer_with_rag(ctx.query, ctx)
+async def acall_live_data(ctx):
+    from modules.live_data_apis import aanswer_with_live_data
+    return await aanswer_with_live_data(ctx.query, parsed=ctx.entities)
+async def acall_general(ctx,mode="module"):
+    from modules.general_chat import aanswer_general_query
+    return await aanswer_general_query(ctx.query,ctx.route,mode)
+def call_link_answer(ctx, num_of_links):
     from modules.link_answer import run
-    src=run(query,num_of_links)
+    src=run(ctx.query,num_of_links,ctx)
     if not src:
         return {"answer": None, "has_answer": False, "meta": {}}
     return {
@@ -67,6 +84,132 @@ def format_live_sources(sources, reason):
         text += s["url"] + "\n"
     return text
 
+FIELD_LABELS = {
+    "train_number": "Train number",
+    "from_station": "Source station",
+    "to_station": "Destination station",
+    "date": "Journey date",
+    "class_type": "Class (e.g., SL, 3A, 2A)",
+    "quota": "Quota (GN / Tatkal)",
+    "station_code": "Station name",
+    "pnr": "PNR number",
+    "hours": "Time window (in hours)"}
+
+# Runs one module for the query
+def run_module(module, ctx):
+    if module == "link_answer":
+        return call_link_answer(ctx, extract_num_links(ctx.query))
+    if module == "railway_rag":
+        return call_railway_rag(ctx)
+    if module == "live_data_apis":
+        return call_live_data(ctx)
+    if module == "general":
+        return call_general(ctx,mode="module")
+    return {"answer": None, "has_answer": False, "meta": {}}
+async def arun_module(module, ctx):
+    if module == "link_answer":
+        # Link lookup is a cached embedding + small index search
+        return call_link_answer(ctx, extract_num_links(ctx.query))
+    if module == "railway_rag":
+        return await acall_railway_rag(ctx)
+    if module == "live_data_apis":
+        return await acall_live_data(ctx)
+    if module == "general":
+        return await acall_general(ctx,mode="module")
+    return {"answer": None, "has_answer": False, "meta": {}}
+
+# Decides whether a module result is the final answer (None -> try next module)
+def accept_result(module, result, ctx, relevance_map):
+    # Link answer(links only)
+    if module == "link_answer":
+        if result.get("has_answer"):
+            return "\n".join(result["answer"])
+        return None
+    # RAG
+    if module == "railway_rag":
+        if result.get("has_answer")==False:
+            return None
+        conf=result.get("meta",{}).get("confidence",0.0)
+        if conf >= HIGH_CONF:
+            return result["answer"]
+        if LOW_CONF <= conf < HIGH_CONF:
+            if relevance_map.get("link_answer",0) > LINK_RELEVANCE_MIN:
+                links = ctx.live_sources()
+                if links:
+                    return (
+                        result["answer"]
+                        + format_live_sources(
+                            links,
+                            reason=link_reason("rag_moderate")
+                        )
+                    )
+            return result["answer"]
+        return None
+    # Live data(APIs)
+    if module == "live_data_apis":
+        if result.get("has_answer")==False and result.get("meta",{}).get("status")=="nothing":
+            return None
+        if result.get("has_answer")==False and result.get("meta",{}).get("status")=="api_failed":
+            links=ctx.live_sources()
+            reason="API_not_working"
+            if links:
+                return (format_live_sources(links,reason=link_reason(reason)))
+        if result.get("has_answer")==False and result.get("meta",{}).get("status")=="need_input":
+            missing=result.get("meta",{}).get("missing_fields",[])
+            readable = [
+                FIELD_LABELS.get(f, f.replace("_", " ").title())
+                for f in missing]
+            reply = ("I need a bit more information to answer this.\n""Missing details: " + ", ".join(readable))
+            candidates = result.get("meta", {}).get("candidates", [])
+            if candidates:
+                reply += "\nDid you mean: " + ", ".join(f"{c['train_number']} {c['name']}" for c in candidates)
+            return reply
+        if result.get("has_answer")==True and result.get("meta",{}).get("status")=="ok":    
+            freshness = result.get("meta", {}).get("freshness", "unknown")
+            fallback_used = result.get("meta", {}).get("fallback_used", False)
+            if freshness == "fresh" and not fallback_used:
+                return result["answer"]
+            if relevance_map.get("link_answer", 0) > LINK_RELEVANCE_MIN:
+                reason=("api_stale" if freshness == "stale" else "api_unknown")
+                links=ctx.live_sources()
+                if links:
+                    return (result["answer"]+ format_live_sources(links,reason=link_reason(reason)))
+        return None
+    # General
+    if module=="general":
+        gen_rel = relevance_map.get("general", 0)
+        src_rel = relevance_map.get("live_sources", 0)
+        if (src_rel > LINK_RELEVANCE_MIN and abs(gen_rel - src_rel) <= RELEVANCE_CLOSE_DELTA):
+            links = ctx.live_sources()
+            if links:
+                return (result["answer"]+ format_live_sources(links,reason=link_reason("general_info")))
+        if result.get("has_answer"):
+            return result["answer"]
+        return None
+    return None
+
+def ordered_modules(preferences):
+    modules = []
+    for pref in preferences:
+        if pref["module"] not in modules:
+            modules.append(pref["module"])
+    return modules
+
+# Modules close enough to the top choice to be started together
+def speculative_group(modules, relevance_map):
+    if not modules:
+        return []
+    top = relevance_map.get(modules[0], 0.0)
+    group = [m for m in modules[:SPECULATIVE_MAX] if top - relevance_map.get(m, 0.0) <= SPECULATIVE_DELTA]
+    return group if len(group) > 1 else []
+
+def discard_tasks(tasks):
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()    # mark as retrieved, losers' errors are irrelevant
+
 #Main
 def answer_query(query):
     structure = analyze_input_structure(query)
@@ -74,94 +217,120 @@ def answer_query(query):
         return "Please enter a query so I can help you."
     if structure == "noise":
         return "I couldn’t understand the input. Please enter a clear question."
+    ctx = QueryContext(query)
     # Calls router
-    route = route_query(query)
+    route = route_query(query, ctx.embedding, extract_entities=FUSED_ROUTING)
+    ctx.route = route
+    ctx.entities = route.get("entities")
     if route.get("router_failed"):
-        return call_general(query,route,mode="failsafe")["answer"]
+        return call_general(ctx,mode="failsafe")["answer"]
     preferences = route["module_preferences"]
     relevance_map = {m["module"]: m["relevance"] for m in preferences}
-    tried = set()
-    for pref in preferences:
-        module = pref["module"]
-        if module in tried:
-            continue
-        tried.add(module)
-        # Link answer(links only)
-        if module == "link_answer":
-            num_links = extract_num_links(query)
-            result = call_link_answer(query, num_links)
-            if result.get("has_answer"):
-                return "\n".join(result["answer"])
-            continue
-        # RAG
+    for module in ordered_modules(preferences):
+        result = run_module(module, ctx)
+        answer = accept_result(module, result, ctx, relevance_map)
+        if answer is not None:
+            return answer
+    # Last failsafe
+    return call_general(ctx,mode="failsafe")["answer"]
+
+# Same pipeline without blocking the event loop
+async def aanswer_query(query, speculative=None):
+    if speculative is None:
+        speculative = SPECULATIVE_MODULES
+    structure = analyze_input_structure(query)
+    if structure == "empty":
+        return "Please enter a query so I can help you."
+    if structure == "noise":
+        return "I couldn’t understand the input. Please enter a clear question."
+    ctx = QueryContext(query)
+    route = await aroute_query(query, await ctx.aembedding(), extract_entities=FUSED_ROUTING)
+    ctx.route = route
+    ctx.entities = route.get("entities")
+    if route.get("router_failed"):
+        return (await acall_general(ctx,mode="failsafe"))["answer"]
+    preferences = route["module_preferences"]
+    relevance_map = {m["module"]: m["relevance"] for m in preferences}
+    modules = ordered_modules(preferences)
+    tasks = {}
+    if speculative:
+        for module in speculative_group(modules, relevance_map):
+            tasks[module] = asyncio.create_task(arun_module(module, ctx))
+    try:
+        # Acceptance still follows preference order; later results just arrive earlier
+        for module in modules:
+            if module in tasks:
+                result = await tasks[module]
+            else:
+                result = await arun_module(module, ctx)
+            answer = accept_result(module, result, ctx, relevance_map)
+            if answer is not None:
+                return answer
+    finally:
+        discard_tasks(tasks.values())
+    return (await acall_general(ctx,mode="failsafe"))["answer"]
+
+# Streaming pipeline: LLM-backed modules yield tokens, others yield their full answer
+async def astream_general(ctx):
+    from modules.general_chat import astream_general_query
+    async for token in astream_general_query(ctx.query):
+        yield token
+
+async def astream_query(query):
+    structure = analyze_input_structure(query)
+    if structure == "empty":
+        yield "Please enter a query so I can help you."
+        return
+    if structure == "noise":
+        yield "I couldn’t understand the input. Please enter a clear question."
+        return
+    ctx = QueryContext(query)
+    route = await aroute_query(query, await ctx.aembedding(), extract_entities=FUSED_ROUTING)
+    ctx.route = route
+    ctx.entities = route.get("entities")
+    if route.get("router_failed"):
+        async for token in astream_general(ctx):
+            yield token
+        return
+    preferences = route["module_preferences"]
+    relevance_map = {m["module"]: m["relevance"] for m in preferences}
+    for module in ordered_modules(preferences):
+        # RAG: confidence is known from retrieval, so acceptance is decided before generating
         if module == "railway_rag":
-            result=call_railway_rag(query)
-            if result.get("has_answer")==False:
+            from modules.railway_rag.railway_base_rag import estimate_confidence, astream_with_rag
+            chunks = await ctx.arules()
+            conf = estimate_confidence(chunks)
+            if not chunks or conf < LOW_CONF:
                 continue
-            conf=result.get("meta",{}).get("confidence",0.0)
-            if conf >= HIGH_CONF:
-                return result["answer"]
-            if LOW_CONF <= conf < HIGH_CONF:
-                if relevance_map.get("link_answer",0) > LINK_RELEVANCE_MIN:
-                    links = retrieve_live_sources(query)
-                    if links:
-                        return (
-                            result["answer"]
-                            + format_live_sources(
-                                links,
-                                reason=link_reason("rag_moderate")
-                            )
-                        )
-                return result["answer"]
-            continue  
-        # Live data(APIs)
-        if module == "live_data_apis":
-            result=call_live_data(query)
-            if result.get("has_answer")==False and result.get("meta",{}).get("status")=="nothing":
+            streamed = False
+            async for token in astream_with_rag(ctx.query, chunks, await ctx.aembedding()):
+                streamed = True
+                yield token
+            if not streamed:
                 continue
-            if result.get("has_answer")==False and result.get("meta",{}).get("status")=="api_failed":
-                links=retrieve_live_sources(query)
-                reason="API_not_working"
+            if conf < HIGH_CONF and relevance_map.get("link_answer",0) > LINK_RELEVANCE_MIN:
+                links = ctx.live_sources()
                 if links:
-                    return (format_live_sources(links,reason=link_reason(reason)))
-            if result.get("has_answer")==False and result.get("meta",{}).get("status")=="need_input":
-                FIELD_LABELS = {
-                "train_number": "Train number",
-                "from_station": "Source station",
-                "to_station": "Destination station",
-                "date": "Journey date",
-                "class_type": "Class (e.g., SL, 3A, 2A)",
-                "quota": "Quota (GN / Tatkal)",
-                "station_code": "Station name",
-                "pnr": "PNR number",
-                "hours": "Time window (in hours)"}
-                missing=result.get("meta",{}).get("missing_fields",[])
-                readable = [
-                    FIELD_LABELS.get(f, f.replace("_", " ").title())
-                    for f in missing]
-                return ("I need a bit more information to answer this.\n""Missing details: " + ", ".join(readable))
-            if result.get("has_answer")==True and result.get("meta",{}).get("status")=="ok":    
-                freshness = result.get("meta", {}).get("freshness", "unknown")
-                fallback_used = result.get("meta", {}).get("fallback_used", False)
-                if freshness == "fresh" and not fallback_used:
-                    return result["answer"]
-                if relevance_map.get("link_answer", 0) > LINK_RELEVANCE_MIN:
-                    reason=("api_stale" if freshness == "stale" else "api_unknown")
-                    links=retrieve_live_sources(query)
-                    if links:
-                        return (result["answer"]+ format_live_sources(links,reason=link_reason(reason)))
-            continue
-        # General
-        if module=="general":
-            result=call_general(query,route,mode="module")
+                    yield format_live_sources(links, reason=link_reason("rag_moderate"))
+            return
+        # General: gating only depends on the route
+        if module == "general":
+            from modules.general_chat import should_answer
+            if not should_answer(ctx.route):
+                continue
+            async for token in astream_general(ctx):
+                yield token
             gen_rel = relevance_map.get("general", 0)
             src_rel = relevance_map.get("live_sources", 0)
             if (src_rel > LINK_RELEVANCE_MIN and abs(gen_rel - src_rel) <= RELEVANCE_CLOSE_DELTA):
-                links = retrieve_live_sources(query)
+                links = ctx.live_sources()
                 if links:
-                    return (result["answer"]+ format_live_sources(links,reason=link_reason("general_info")))
-            if result.get("has_answer"):
-                return result["answer"]
-            continue
-    # Last failsafe
-    return call_general(query,route,mode="failsafe")["answer"]
\ No newline at end of file
+                    yield format_live_sources(links, reason=link_reason("general_info"))
+            return
+        result = await arun_module(module, ctx)
+        answer = accept_result(module, result, ctx, relevance_map)
+        if answer is not None:
+            yield answer if isinstance(answer, str) else str(answer)
+            return
+    async for token in astream_general(ctx):
+        yield token
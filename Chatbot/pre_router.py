@@ -0,0 +1,141 @@
+# Local first-stage router: pattern rules + nearest-centroid classifier
+import os
+import re
+import numpy as np
+from helpers.embeddings import encode_query
+
+# Centroid decision needs a clear winner, else the LLM router decides
+CENTROID_MIN_SIMILARITY = float(os.getenv("PRE_ROUTER_MIN_SIMILARITY", "0.55"))
+CENTROID_MIN_MARGIN = float(os.getenv("PRE_ROUTER_MIN_MARGIN", "0.12"))
+
+PNR_PATTERN = re.compile(r"^\s*(?:pnr(?:\s*(?:no\.?|number|status))?\s*[:#-]?\s*)?\d{10}\s*$", re.I)
+TRAIN_STATUS_PATTERN = re.compile(
+    r"\b\d{5}\b.*\b(running status|live status|where is|current location|schedule|timetable)\b"
+    r"|\b(running status|live status|where is|current location|schedule|timetable)\b.*\b\d{5}\b",
+    re.I
+)
+# A train number next to these is a rules question ("refund for 12951 delay")
+RULE_WORDS_PATTERN = re.compile(
+    r"\b(refunds?|penalty|penalties|fine|rules?|compensation|claim|tdr|cancel(lation)?|allowed)\b",
+    re.I
+)
+# The link noun must directly follow the verb ("send me 3 official links"),
+# so "show me the refund rules and the website" stays a rules question
+LINK_PATTERN = re.compile(
+    r"\b(give|show|share|send|need|want|list|provide)(\s+me)?"
+    r"(\s+(the|a|an|some|any|all|more|\d+|official|useful|relevant|irctc|railway))*"
+    r"\s+(links?|urls?|websites?|sources?)\b"
+    r"|^\s*(\d+\s+)?(links?|urls?|websites?)\b",
+    re.I
+)
+GREETING_PATTERN = re.compile(
+    r"^\s*(hi|hii+|hello|hey|thanks|thank you|ok(ay)?|good (morning|afternoon|evening|night)|bye)\b[\s!.]*$",
+    re.I
+)
+
+# Fixed rankings for unambiguous patterns (same shape as the LLM router)
+PATTERN_PREFERENCES = {
+    "live_data_apis": {"live_data_apis": 0.95, "link_answer": 0.20, "railway_rag": 0.05, "general": 0.05},
+    "link_answer": {"link_answer": 0.95, "railway_rag": 0.05, "live_data_apis": 0.05, "general": 0.05},
+    "general": {"general": 0.95, "railway_rag": 0.05, "live_data_apis": 0.05, "link_answer": 0.0},
+}
+# Centroid winners get the same calibrated shape (cosine similarities are not relevances)
+CENTROID_WINNER_RELEVANCE = 0.9
+# Winners whose answers may carry official links (stale/fallback live data,
+# moderate-confidence rules) keep link_answer relevant, as in PATTERN_PREFERENCES
+CENTROID_LINK_RELEVANCE = {"live_data_apis": 0.20, "railway_rag": 0.20}
+
+CENTROID_EXAMPLES = {
+    "railway_rag": [
+        "what is the luggage allowance in sleeper class",
+        "rules for ticket cancellation and refund",
+        "penalty for travelling without a ticket",
+        "can I carry pets on the train",
+        "is smoking allowed on railway premises",
+        "procedure to claim compensation for an accident",
+    ],
+    "live_data_apis": [
+        "live running status of train 12951",
+        "pnr status 4521789632",
+        "seat availability in 3A from delhi to mumbai tomorrow",
+        "trains between howrah and patna",
+        "fare from chennai to bangalore in sleeper",
+        "arrivals at new delhi station in next 2 hours",
+    ],
+    "general": [
+        "hello how are you",
+        "thank you for the help",
+        "what can you do",
+        "explain what a rag system is",
+        "tell me a fun fact about trains",
+        "who are you",
+    ],
+    "link_answer": [
+        "give me links to official railway websites",
+        "where can I check this officially",
+        "share the irctc website",
+        "official sources for railway rules",
+        "send me 3 links",
+        "which website shows railway circulars",
+    ],
+}
+
+_centroids = None
+_centroid_modules = None
+
+def _load_centroids():
+    global _centroids, _centroid_modules
+    if _centroids is None:
+        modules = list(CENTROID_EXAMPLES)
+        rows = []
+        for m in modules:
+            vecs = np.vstack([encode_query(q) for q in CENTROID_EXAMPLES[m]])
+            c = vecs.mean(axis=0)
+            rows.append(c / np.linalg.norm(c))
+        _centroid_modules = modules
+        _centroids = np.vstack(rows).astype("float32")
+    return _centroids, _centroid_modules
+
+def _as_preferences(scores: dict):
+    prefs = [{"module": m, "relevance": round(float(r), 4)} for m, r in scores.items()]
+    prefs.sort(key=lambda x: x["relevance"], reverse=True)
+    return prefs
+
+def centroid_preferences(winner: str):
+    scores = {m: 0.05 for m in CENTROID_EXAMPLES}
+    scores["link_answer"] = CENTROID_LINK_RELEVANCE.get(winner, 0.0)
+    scores[winner] = CENTROID_WINNER_RELEVANCE
+    return _as_preferences(scores)
+
+def match_patterns(query: str):
+    q = query.strip()
+    if PNR_PATTERN.match(q) or (TRAIN_STATUS_PATTERN.search(q) and not RULE_WORDS_PATTERN.search(q)):
+        return "live_data_apis"
+    if LINK_PATTERN.search(q):
+        return "link_answer"
+    if GREETING_PATTERN.match(q):
+        return "general"
+    return None
+
+def pre_route(query: str, query_embedding=None):
+    """Returns a route dict for confident local decisions, else None."""
+    module = match_patterns(query)
+    if module:
+        return {
+            "router_failed": False,
+            "module_preferences": _as_preferences(PATTERN_PREFERENCES[module]),
+            "pre_routed": "pattern"
+        }
+    if query_embedding is None:
+        query_embedding = encode_query(query)
+    centroids, modules = _load_centroids()
+    sims = centroids @ np.asarray(query_embedding, dtype="float32").reshape(-1)
+    order = np.argsort(-sims)
+    best, second = sims[order[0]], sims[order[1]]
+    if best < CENTROID_MIN_SIMILARITY or best - second < CENTROID_MIN_MARGIN:
+        return None
+    return {
+        "router_failed": False,
+        "module_preferences": centroid_preferences(modules[order[0]]),
+        "pre_routed": "centroid"
+    }
@@ -1,9 +1,14 @@
 import os
 import json
-from openai import OpenAI
+import asyncio
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from helpers.embeddings import encode_query
+from helpers.semantic_cache import SemanticCache
+from Chatbot.pre_router import pre_route
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 if not client:
     raise RuntimeError("OPENAI_API_KEY is not set")
 MODEL_NAME = "gpt-4.1-mini"
@@ -49,17 +54,44 @@ ROUTER_SYSTEM_PROMPT = (
 
 VALID_MODULES = {"railway_rag", "live_data_apis", "general", "link_answer"}
 
-def route_query(query):
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
-            {"role": "user", "content": query}
-        ],
-        temperature=0
+# Routing cache: near-duplicate phrasings reuse a previous ranking
+ROUTE_CACHE_MAX_DISTANCE = float(os.getenv("ROUTE_CACHE_MAX_DISTANCE", "0.05"))
+ROUTE_CACHE_TTL = int(os.getenv("ROUTE_CACHE_TTL", "3600"))
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "1024"))
+route_cache = SemanticCache(
+    max_entries=ROUTE_CACHE_SIZE,
+    ttl_seconds=ROUTE_CACHE_TTL,
+    max_distance=ROUTE_CACHE_MAX_DISTANCE
+)
+
+def fused_system_prompt():
+    # Entity schema is owned by the live data module
+    from modules.live_data_apis import ENTITY_PROMPT
+    return (
+        ROUTER_SYSTEM_PROMPT + "\n\n"
+        "In the SAME JSON object, also add an \"entities\" key holding the\n"
+        "railway entities of the input, extracted with the rules and schema below.\n"
+        "Extract entities even when live_data_apis is not ranked first.\n"
+        + ENTITY_PROMPT
     )
+
+def lookup_route(query, query_embedding):
+    # Obvious intents and repeated phrasings never reach the LLM
+    local = pre_route(query, query_embedding)
+    if local is not None:
+        return local
+    cached = route_cache.get(query_embedding)
+    if cached is not None:
+        return {
+            "router_failed": False,
+            "module_preferences": [dict(m) for m in cached],
+            "cached": True
+        }
+    return None
+
+def parse_route(content, query_embedding):
     try:
-        parsed = json.loads(response.choices[0].message.content)
+        parsed = json.loads(content)
         prefs = parsed["module_preferences"]
     except Exception:
         # Explicit router failure (no guessing)
@@ -86,7 +118,51 @@ def route_query(query):
             cleaned.append({"module": m, "relevance": 0.0})
     cleaned.sort(key=lambda x: x["relevance"], reverse=True)
     print(cleaned)
-    return {
+    # Only the ranking is cached; entities belong to this exact query
+    route_cache.put(query_embedding, [dict(m) for m in cleaned])
+    route = {
         "router_failed": False,
         "module_preferences": cleaned,
-    }
\ No newline at end of file
+    }
+    if isinstance(parsed.get("entities"), dict):
+        route["entities"] = parsed["entities"]
+    return route
+
+def router_request(query, extract_entities=False):
+    if extract_entities:
+        return {
+            "model": MODEL_NAME,
+            "messages": [
+                {"role": "system", "content": fused_system_prompt()},
+                {"role": "user", "content": query}
+            ],
+            "temperature": 0,
+            "response_format": {"type": "json_object"}
+        }
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
+            {"role": "user", "content": query}
+        ],
+        "temperature": 0
+    }
+
+def route_query(query, query_embedding=None, extract_entities=False):
+    """Ranks modules; with extract_entities the same call also returns live-data entities."""
+    if query_embedding is None:
+        query_embedding = encode_query(query)
+    route = lookup_route(query, query_embedding)
+    if route is not None:
+        return route
+    response = client.chat.completions.create(**router_request(query, extract_entities))
+    return parse_route(response.choices[0].message.content, query_embedding)
+
+async def aroute_query(query, query_embedding=None, extract_entities=False):
+    if query_embedding is None:
+        query_embedding = await asyncio.to_thread(encode_query, query)
+    route = lookup_route(query, query_embedding)
+    if route is not None:
+        return route
+    response = await aclient.chat.completions.create(**router_request(query, extract_entities))
+    return parse_route(response.choices[0].message.content, query_embedding)
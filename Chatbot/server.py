@@ -1,15 +1,25 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 import os
+import json
+import asyncio
 import traceback
 from dotenv import load_dotenv
 load_dotenv()
-from Chatbot.bot import answer_query
+from Chatbot.bot import aanswer_query, astream_query
+from Chatbot.startup import readiness, warmup
 
-app = FastAPI(title="Railway Assistant")
+@asynccontextmanager
+async def lifespan(app):
+    # Warmup runs in the background; /ready answers 503 until it is done
+    app.state.warmup = asyncio.create_task(asyncio.to_thread(warmup))
+    yield
+
+app = FastAPI(title="Railway Assistant", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],       
@@ -30,7 +40,7 @@ class ChatResponse(BaseModel):
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        answer = answer_query(request.query)
+        answer = await aanswer_query(request.query)
         # Defensive fallback (never return None)
         if not answer:
             answer = "I couldn’t process that. Please try rephrasing your question."
@@ -43,6 +53,30 @@ async def chat(request: ChatRequest):
         "source": None
     }
 
+# Server-sent events: one "data" event per text delta, then a "done" event
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    async def events():
+        try:
+            async for delta in astream_query(request.query):
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+        except Exception:
+            traceback.print_exc()
+            error = "Something went wrong while processing your request."
+            yield f"data: {json.dumps({'delta': error})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Load balancer probe: per-component load timings, 503 until warmup succeeded
+@app.get("/ready")
+def ready():
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 @app.get("/")
 def serve_ui():
     return FileResponse(os.path.join(FRONTEND_DIR, "index.html"))
@@ -0,0 +1,84 @@
+# Startup lifecycle: every heavy component is loaded and exercised once
+# before the app reports ready, so no user request pays the load time
+import time
+import importlib
+import threading
+import traceback
+
+WARMUP_QUERY = "what is the luggage allowance in sleeper class"
+WARMUP_STATION = "new delhi"
+WARMUP_TRAIN = "chennai express"
+
+_lock = threading.Lock()
+_status = {"ready": False, "done": False, "seconds": None, "components": {}}
+
+def load_embedding_model():
+    from helpers.embeddings import get_model
+    get_model()
+
+def warmup_embedding():
+    from helpers.embeddings import get_model
+    return get_model().encode([WARMUP_QUERY], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+
+def warm_router():
+    importlib.import_module("Chatbot.router")   # LLM clients and route cache
+    from Chatbot.pre_router import _load_centroids
+    _load_centroids()
+
+def warm_rules_index():
+    from modules.railway_rag.retrieval_engine import retrieve_rules
+    retrieve_rules(WARMUP_QUERY, query_embedding=warmup_embedding())
+
+def warm_live_sources():
+    from helpers.live_sources import retrieve_live_sources
+    retrieve_live_sources(WARMUP_QUERY, query_embedding=warmup_embedding())
+
+def warm_modules():
+    # Imported for their clients and module-level setup
+    for name in ("modules.railway_rag.railway_base_rag", "modules.general_chat", "modules.link_answer"):
+        importlib.import_module(name)
+
+def warm_live_data():
+    # Station/train indexes and API clients load on import; one lookup each exercises them
+    from modules.live_data_apis import TRAIN_SEARCH, lookup_station_code
+    lookup_station_code(WARMUP_STATION)
+    TRAIN_SEARCH.search(WARMUP_TRAIN)
+
+# Order matters: the embedding model is loaded (and timed) on its own first
+COMPONENTS = [
+    ("embedding_model", load_embedding_model),
+    ("embeddings", warmup_embedding),
+    ("router", warm_router),
+    ("rules_index", warm_rules_index),
+    ("live_sources", warm_live_sources),
+    ("answer_modules", warm_modules),
+    ("live_data", warm_live_data),
+]
+
+def readiness() -> dict:
+    with _lock:
+        return {**_status, "components": {k: dict(v) for k, v in _status["components"].items()}}
+
+def warmup() -> dict:
+    """Loads and warms each component once (later calls return at once); returns readiness()."""
+    if _status["done"]:
+        return readiness()
+    start = time.perf_counter()
+    for name, fn in COMPONENTS:
+        t0 = time.perf_counter()
+        entry = {}
+        try:
+            fn()
+        except Exception as e:
+            traceback.print_exc()
+            entry["error"] = f"{type(e).__name__}: {e}"
+        entry["seconds"] = round(time.perf_counter() - t0, 3)
+        with _lock:
+            _status["components"][name] = entry
+        print(f"[startup] {name:<15}{entry['seconds']:>8.2f}s{'  FAILED' if 'error' in entry else ''}")
+    with _lock:
+        _status["seconds"] = round(time.perf_counter() - start, 3)
+        _status["ready"] = all("error" not in c for c in _status["components"].values())
+        _status["done"] = True
+    print(f"[startup] {'ready' if _status['ready'] else 'NOT ready'} after {_status['seconds']:.2f}s")
+    return readiness()
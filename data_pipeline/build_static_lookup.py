@@ -7,6 +7,7 @@ OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 train_lookup = {}
 station_lookup = {}
+train_index = {}
 
 STATION_EXPANSIONS = {
     " JN": " JUNCTION"
@@ -18,6 +19,38 @@ TRAIN_EXPANSIONS = {
     " SPL ": " SPECIAL "
 }
 
+# Common/old city names -> main station (kept only if the code is in the data).
+# A real station name always wins over an alias ("delhi" is DLI, not NDLS),
+# so aliases that collide with one are dropped when the index is written.
+STATION_ALIASES = {
+    "mumbai": "CSMT",
+    "bombay": "CSMT",
+    "calcutta": "HWH",
+    "chennai": "MAS",
+    "madras": "MAS",
+    "bangalore": "SBC",
+    "bengaluru": "SBC",
+    "hyderabad": "HYB",
+    "trivandrum": "TVC",
+    "thiruvananthapuram": "TVC",
+    "cochin": "ERS",
+    "kochi": "ERS",
+    "calicut": "CLT",
+    "poona": "PUNE",
+    "baroda": "BRC",
+    "vadodara": "BRC",
+    "allahabad": "PRYJ",
+    "prayagraj": "PRYJ",
+    "varanasi": "BSB",
+    "kanpur": "CNB",
+    "lucknow": "LKO",
+    "patna": "PNBE",
+    "guwahati": "GHY",
+    "ahmedabad": "ADI",
+    "jaipur": "JP",
+    "bhopal": "BPL",
+}
+
 def normalize(text: str) -> str:
     return " ".join(text.upper().split())
 
@@ -33,13 +66,36 @@ def expand_all(name: str, expansions: dict) -> str:
 
     return normalize(expanded)
 
+# Words in train names that are never station codes ("DR SPL", "SF", "DEMU")
+TRAIN_NAME_WORDS = {"SPL", "SF", "EXP", "DEMU", "MEMU", "MAIL", "PASS", "SPECIAL", "EXPRESS", "SUPERFAST"}
+
+def name_endpoints(name: str, codes: set):
+    # Codes/station names at either end of names like "NDLS HWH RAJDHANI", "PUNE KOP SPECIAL"
+    found = []
+    for token in name.upper().split():
+        if len(token) < 2 or token in TRAIN_NAME_WORDS:
+            continue
+        code = token if token in codes else station_lookup.get(token.lower())
+        if code and code not in found:
+            found.append(code)
+    return (found[0], found[-1]) if len(found) >= 2 else None
+
 def split_station(station_str):
     if not station_str or "-" not in station_str:
         return None, None
     name, code = station_str.rsplit("-", 1)
     return normalize(name), code.strip().upper()
 
-for file in INP_DIR.glob("*.json"):
+raw_files = sorted(INP_DIR.glob("*.json"))
+if not raw_files:
+    # Raw timetable dump not available: rebuild the indexes from the committed lookups
+    print(f"⚠️ No raw files in {INP_DIR}, using the existing lookups")
+    with open(OUT_DIR / "trains_lookup.json", "r", encoding="utf-8") as f:
+        train_lookup = json.load(f)
+    with open(OUT_DIR / "stations_lookup.json", "r", encoding="utf-8") as f:
+        station_lookup = json.load(f)
+
+for file in raw_files:
     with open(file, "r", encoding="utf-8") as f:
         records = json.load(f)
     for r in records:
@@ -51,6 +107,17 @@ for file in INP_DIR.glob("*.json"):
             train_lookup[original.lower()] = tn
             if expanded != original:
                 train_lookup[expanded.lower()] = tn
+            entry = train_index.setdefault(tn, {"number": tn, "names": []})
+            for n in (original, expanded):
+                if n not in entry["names"]:
+                    entry["names"].append(n)
+            # Endpoint stations as [name, code] for "rajdhani from howrah"
+            route = r.get("trainRoute") or []
+            if route:
+                for end, stop in (("from", route[0]), ("to", route[-1])):
+                    name, code = split_station(stop.get("stationName"))
+                    if name and code:
+                        entry.setdefault(end, [name, code])
         for stop in r.get("trainRoute", []):
             raw = stop.get("stationName")
             name, code = split_station(raw)
@@ -66,6 +133,38 @@ with open(OUT_DIR / "trains_lookup.json", "w", encoding="utf-8") as f:
 with open(OUT_DIR / "stations_lookup.json", "w", encoding="utf-8") as f:
     json.dump(station_lookup, f, indent=2, ensure_ascii=False)
 
+# Fuzzy station index source (helpers/fuzzy_lookup.py builds the in-memory index)
+station_codes = sorted(set(station_lookup.values()))
+with open(OUT_DIR / "stations_index.json", "w", encoding="utf-8") as f:
+    json.dump({
+        "entries": station_lookup,
+        "aliases": {
+            k: v for k, v in STATION_ALIASES.items()
+            if v in station_codes and k not in station_lookup
+        },
+        "codes": station_codes
+    }, f, ensure_ascii=False)
+
+# Ranked train search source (helpers/fuzzy_lookup.py TrainSearch); trains
+# without route data get endpoints read from their name. Only written from the
+# raw dump: the name -> number lookup keeps one number per name, so an up/down
+# pair sharing a name would lose a train.
+station_names = {}
+for name, code in sorted(station_lookup.items(), key=lambda x: len(x[0])):
+    station_names.setdefault(code, name.upper())
+for entry in train_index.values():
+    if "from" in entry:
+        continue
+    ends = name_endpoints(entry["names"][0], set(station_codes))
+    if ends:
+        entry["from"] = [station_names[ends[0]], ends[0]]
+        entry["to"] = [station_names[ends[1]], ends[1]]
+if train_index:
+    with open(OUT_DIR / "trains_index.json", "w", encoding="utf-8") as f:
+        json.dump(list(train_index.values()), f, ensure_ascii=False)
+else:
+    print("⚠️ trains_index.json not written, the app ranks trains from trains_lookup.json")
+
 print("✅ Static lookup files created")
 print("Trains:", len(train_lookup))
 print("Stations:", len(station_lookup))
@@ -1,83 +1,319 @@
 #Creating embeddings, vector index & implementing FAISS(manages vector indexes)
 
+import os
+import sys
 import json
+import hashlib
+import time
+import argparse
 from pathlib import Path
 import faiss
+import numpy as np
 from sentence_transformers import SentenceTransformer
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from modules.railway_rag.chunk_features import compute_chunk_features, save_chunk_features
+from helpers.chunk_store import CHUNK_SCHEMA, URL_SCHEMA, ChunkStore, ChunkStoreWriter
+from helpers.records import read_records
+from helpers.vector_store import (
+    INDEX_SPECS,
+    apply_search_params,
+    build_index,
+    create_index,
+    load_index,
+    load_index_info,
+    save_index,
+    supports_removal,
+)
 
 DATA_DIR = Path("data")
 CHUNKS_DIR = DATA_DIR / "chunks"
 VECTOR_DIR = DATA_DIR / "vector_store"
 VECTOR_DIR.mkdir(parents=True, exist_ok=True)
 CHUNK_FILES=[
-    CHUNKS_DIR/"core_docs_chunks.json",
-    CHUNKS_DIR/"circulars_chunks.json",
-    CHUNKS_DIR/"live_sources_chunks.json",
+    CHUNKS_DIR/"core_docs_chunks.jsonl",
+    CHUNKS_DIR/"circulars_chunks.jsonl",
+    CHUNKS_DIR/"live_sources_chunks.jsonl",
 ]
 RULES_FAISS_INDEX_FILE = VECTOR_DIR / "rules_faiss.index"
-RULES_METADATA_FILE = VECTOR_DIR / "rules_metadata.json"
+RULES_METADATA_DIR = VECTOR_DIR / "rules_metadata"
+RULES_FEATURES_FILE = VECTOR_DIR / "rules_features.npz"
+RULES_VECTORS_FILE = VECTOR_DIR / "rules_vectors.npy"
 LIVE_FAISS_INDEX_FILE = VECTOR_DIR / "live_faiss.index"
-LIVE_METADATA_FILE = VECTOR_DIR / "live_metadata.json"
-
-model=SentenceTransformer("all-MiniLM-L6-v2")
-rules_texts=[]
-rules_metadata=[]
-live_texts=[]
-live_metadata=[]
-for file in CHUNK_FILES:
-    if not file.exists():
-        continue
-    with open(file,"r",encoding="utf-8") as f:
-        records=json.load(f)
+LIVE_METADATA_DIR = VECTOR_DIR / "live_metadata"
+LIVE_VECTORS_FILE = VECTOR_DIR / "live_vectors.npy"
+LIVE_URL_FAISS_INDEX_FILE = VECTOR_DIR / "live_url_faiss.index"
+LIVE_URL_METADATA_DIR = VECTOR_DIR / "live_url_metadata"
+
+def add_arguments(parser):
+    parser.add_argument("--rules-index", default="flat", help=f"{', '.join(INDEX_SPECS)} or a FAISS factory string")
+    parser.add_argument("--live-index", default="flat", help="index spec for the live-source indexes")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF lists probed per search")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node")
+    parser.add_argument("--ef-search", type=int, default=None, help="HNSW search breadth")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-quantizers (default dim/8)")
+    parser.add_argument("--full", action="store_true", help="re-embed every chunk instead of only new/changed ones")
+    parser.add_argument("--batch-size", type=int, default=256, help="chunks embedded and added to the index at a time")
+    parser.add_argument("--bench-queries", type=int, default=200, help="queries for the recall/latency report")
+
+def index_options(args, spec):
+    # Search params that apply to this spec + factory options
+    params = {}
+    if args.nprobe is not None and "ivf" in spec.lower():
+        params["nprobe"] = args.nprobe
+    if args.ef_search is not None and "hnsw" in spec.lower():
+        params["efSearch"] = args.ef_search
+    return params, {"nlist": args.nlist, "hnsw_m": args.hnsw_m, "pq_m": args.pq_m}
+
+def make_index(embeddings, spec, args, ids=None):
+    params, factory_kwargs = index_options(args, spec)
+    return build_index(embeddings, spec, params, ids=ids, **factory_kwargs)
+
+def timed_search(index, queries, k):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+# Recall@k and per-query latency of an approximate index vs the exact Flat baseline
+def compare_with_flat(name, embeddings, index, info, args, ids=None, k=10):
+    if info["factory"] == "Flat" or len(embeddings) == 0:
+        return
+    rng = np.random.default_rng(0)
+    queries = embeddings[rng.choice(len(embeddings), min(args.bench_queries, len(embeddings)), replace=False)]
+    k = min(k, len(embeddings))
+    flat = faiss.IndexFlatIP(embeddings.shape[1])
+    flat.add(embeddings)
+    truth, flat_ms = timed_search(flat, queries, k)
+    if ids is not None:
+        truth = ids[truth]
+    print(f"\n{name}: {info['factory']} vs Flat (recall@{k}, {len(queries)} queries)")
+    print(f"  {'setting':<16}{'recall':>8}{'ms/query':>10}")
+    print(f"  {'Flat (exact)':<16}{1.0:>8.3f}{flat_ms:>10.3f}")
+    sweep = []
+    if "nprobe" in info["search_params"]:
+        sweep = [("nprobe", v) for v in (1, 4, 8, 16, 32, 64, 128)]
+    elif "efSearch" in info["search_params"]:
+        sweep = [("efSearch", v) for v in (16, 32, 64, 128, 256)]
+    chosen = dict(info["search_params"])
+    for param, value in sweep or [(None, None)]:
+        if param:
+            apply_search_params(index, {param: value})
+        ids, ms = timed_search(index, queries, k)
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(ids, truth)])
+        label = f"{param}={value}" if param else info["spec"]
+        mark = " <- saved" if param and chosen.get(param) == value else ""
+        print(f"  {label:<16}{recall:>8.3f}{ms:>10.3f}{mark}")
+    apply_search_params(index, chosen)
+
+META_FIELDS = [
+    "chunk_id", "document_path", "doc_category", "rule_type", "priority", "page_number",
+    "section_index", "authority", "is_static", "effective_year", "text"
+]
+
+def chunk_hash(rec):
+    # chunking.py stores it; older chunk files get the same hash computed here
+    if rec.get("content_hash"):
+        return rec["content_hash"]
+    payload = json.dumps({k: v for k, v in rec.items() if k != "content_hash"}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+model = None
+
+def load_model():
+    global model
+    if model is None:
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+    return model
+
+def encode(texts):
+    return load_model().encode(
+        texts,
+        batch_size=32,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    ).astype("float32")
+
+def has_records(path):
+    return path.exists() or path.with_suffix(".json").exists()
+
+def previous_metadata(metadata_dir):
+    # Chunk store of the last build, or the JSON(L) metadata of older builds
+    if ChunkStore.exists(metadata_dir):
+        store = ChunkStore(metadata_dir)
+        return (store.row(row, ["chunk_id", "content_hash", "vector_id"]) for row in range(len(store)))
+    legacy = metadata_dir.with_suffix(".jsonl")
+    return read_records(legacy) if has_records(legacy) else None
+
+def load_previous(index_file, metadata_dir, vectors_file, args):
+    # chunk_id -> (content_hash, vector_id, row) of the last build; vectors stay on disk
+    if args.full or not (index_file.exists() and vectors_file.exists()):
+        return None
+    metadata = previous_metadata(metadata_dir)
+    if metadata is None:
+        return None
+    rows = {}
+    vector_ids = []
+    for row, meta in enumerate(metadata):
+        if "vector_id" not in meta:
+            return None
+        rows[meta["chunk_id"]] = (meta["content_hash"], meta["vector_id"], row)
+        vector_ids.append(meta["vector_id"])
+    vectors = np.load(vectors_file, mmap_mode="r")
+    if len(vectors) != len(vector_ids):
+        return None
+    return load_index(index_file), load_index_info(index_file), rows, vector_ids, vectors
+
+def batched(records, size):
+    batch = []
     for rec in records:
-        meta = {
-            "chunk_id": rec["chunk_id"],
-            "document_path": rec["document_path"],
-            "doc_category": rec["doc_category"],
-            "rule_type": rec["rule_type"],
-            "priority": rec["priority"],
-            "page_number": rec["page_number"],
-            "section_index": rec["section_index"],
-            "authority": rec.get("authority"),
-            "is_static": rec.get("is_static"),
-            "effective_year": rec.get("effective_year"),
-            "text": rec.get("text")
-        }
-        if rec["doc_category"] == "live_source":
-            live_texts.append(rec["text"])
-            live_metadata.append(meta)
-        else:
-            rules_texts.append(rec["text"])
-            rules_metadata.append(meta)
-
-rules_embeddings = model.encode(
-    rules_texts,
-    batch_size=32,
-    show_progress_bar=True,
-    convert_to_numpy=True,
-    normalize_embeddings=True
-)
-rules_index = faiss.IndexFlatIP(rules_embeddings.shape[1])
-rules_index.add(rules_embeddings)
-faiss.write_index(rules_index,str(RULES_FAISS_INDEX_FILE))
-with open(RULES_METADATA_FILE, "w", encoding="utf-8") as f:
-    json.dump(rules_metadata, f, indent=2, ensure_ascii=False)
-
-live_embeddings = model.encode(
-    live_texts,
-    batch_size=32,
-    show_progress_bar=True,
-    convert_to_numpy=True,
-    normalize_embeddings=True
-)
-live_index = faiss.IndexFlatIP(live_embeddings.shape[1])
-live_index.add(live_embeddings)
-faiss.write_index(live_index, str(LIVE_FAISS_INDEX_FILE))
-with open(LIVE_METADATA_FILE,"w",encoding="utf-8") as f:
-    json.dump(live_metadata, f, indent=2, ensure_ascii=False)
-
-print(f"Rules chunks loaded     : {len(rules_texts)}")
-print(f"Live source chunks loaded: {len(live_texts)}")
-print(f"Rules FAISS index size  : {rules_index.ntotal}")
-print(f"Live FAISS index size   : {live_index.ntotal}")
-print("✅ Embeddings and FAISS index saved successfully.")
\ No newline at end of file
+        batch.append(rec)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# Streams chunk records in fixed-size batches: unchanged chunks keep their
+# vector and vector_id, the rest are embedded, and each batch goes straight
+# into the index (and to the metadata file) before the next one is read.
+def update_store(name, records, index_file, metadata_dir, vectors_file, spec, args):
+    previous = load_previous(index_file, metadata_dir, vectors_file, args)
+    old_index, old_info, old_rows, old_ids, old_vectors = previous or (None, {}, {}, [], None)
+    next_id = max(old_ids, default=-1) + 1
+    dim = load_model().get_sentence_embedding_dimension()
+    incremental = old_index is not None and old_info.get("spec") == spec and supports_removal(old_info)
+    if incremental:
+        index, info = old_index, old_info
+    else:
+        # Trained specs (IVF, PQ, SQ) need every vector first and are built at the end
+        params, factory_kwargs = index_options(args, spec)
+        index, info = create_index(spec, 0, dim, params, with_ids=True, **factory_kwargs)
+        if not index.is_trained:
+            index = None
+    blocks, id_blocks = [], []
+    kept_ids = set()
+    embedded = 0
+
+    def metadata_rows(old_vectors):
+        nonlocal next_id, embedded
+        for batch in batched(records, args.batch_size):
+            metadata, old = [], []
+            for rec in batch:
+                meta = {k: rec.get(k) for k in META_FIELDS}
+                meta["content_hash"] = chunk_hash(rec)
+                prev = old_rows.get(meta["chunk_id"])
+                if prev and prev[0] == meta["content_hash"] and prev[1] not in kept_ids:
+                    meta["vector_id"] = prev[1]
+                    kept_ids.add(prev[1])
+                    old.append(prev[2])
+                else:
+                    meta["vector_id"] = next_id
+                    next_id += 1
+                    old.append(None)
+                metadata.append(meta)
+            vectors = np.zeros((len(metadata), dim), dtype="float32")
+            new = [i for i, row in enumerate(old) if row is None]
+            for i, row in enumerate(old):
+                if row is not None:
+                    vectors[i] = old_vectors[row]
+            if new:
+                vectors[new] = encode([metadata[i]["text"] for i in new])
+            ids = np.array([m["vector_id"] for m in metadata], dtype="int64")
+            add = new if incremental else list(range(len(metadata)))
+            if index is not None and add:
+                index.add_with_ids(vectors[add], ids[add])
+            blocks.append(vectors)
+            id_blocks.append(ids)
+            embedded += len(new)
+            yield from metadata
+
+    writer = ChunkStoreWriter(metadata_dir, CHUNK_SCHEMA)
+    for meta in metadata_rows(old_vectors):
+        writer.add(meta)
+    count = writer.close()
+    # Unmap the old vectors file, else replacing it fails on Windows
+    previous = old_vectors = None
+    vectors = np.vstack(blocks) if blocks else np.zeros((0, dim), dtype="float32")
+    ids = np.concatenate(id_blocks) if id_blocks else np.zeros(0, dtype="int64")
+    removed_ids = [i for i in old_ids if i not in kept_ids]
+    if incremental:
+        # Delete by id in the existing index (new vectors were added per batch)
+        if removed_ids:
+            index.remove_ids(np.array(removed_ids, dtype="int64"))
+    else:
+        if index is None:
+            index, info = make_index(vectors, spec, args, ids=ids)
+        compare_with_flat(name, vectors, index, info, args, ids)
+    save_index(index, index_file, info)
+    tmp = vectors_file.with_name(vectors_file.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, vectors)
+    os.replace(tmp, vectors_file)
+    print(f"{name}: {count - embedded} unchanged, {embedded} embedded, {len(removed_ids)} removed")
+    return index, info, vectors
+
+def read_chunks(live):
+    for file in CHUNK_FILES:
+        if not has_records(file):
+            continue
+        for rec in read_records(file):
+            if (rec["doc_category"] == "live_source") == live:
+                yield rec
+
+# URL-level index: one mean-pooled vector per live source URL (link lookups need no dedup)
+def build_url_index(live_vectors, args):
+    url_rows = {}
+    url_metadata = {}
+    store = ChunkStore(LIVE_METADATA_DIR)
+    for i in range(len(store)):
+        meta = store.row(i, ["document_path", "authority", "text"])
+        url = meta["document_path"]
+        if not url:
+            continue
+        url_rows.setdefault(url, []).append(i)
+        url_metadata.setdefault(url, {
+            "url": url,
+            "authority": meta.get("authority"),
+            "description": meta.get("text")
+        })
+    url_embeddings = np.vstack([
+        live_vectors[rows].mean(axis=0) for rows in url_rows.values()
+    ]).astype("float32")
+    faiss.normalize_L2(url_embeddings)
+    # Exact search: a few dozen URLs, and the chunk index spec does not apply
+    url_index, url_info = make_index(url_embeddings, "flat", args)
+    save_index(url_index, LIVE_URL_FAISS_INDEX_FILE, url_info)
+    writer = ChunkStoreWriter(LIVE_URL_METADATA_DIR, URL_SCHEMA)
+    for meta in url_metadata.values():
+        writer.add(meta)
+    writer.close()
+    return url_index, url_info
+
+def build_stores(rules_records, live_records, args):
+    rules_index, rules_info, rules_vectors = update_store(
+        "Rules index", rules_records,
+        RULES_FAISS_INDEX_FILE, RULES_METADATA_DIR, RULES_VECTORS_FILE, args.rules_index, args
+    )
+    # Re-ranking features so retrieval never rescans chunk text
+    save_chunk_features(RULES_FEATURES_FILE, compute_chunk_features(ChunkStore(RULES_METADATA_DIR)))
+    live_index, live_info, live_vectors = update_store(
+        "Live index", live_records,
+        LIVE_FAISS_INDEX_FILE, LIVE_METADATA_DIR, LIVE_VECTORS_FILE, args.live_index, args
+    )
+    url_index, url_info = build_url_index(live_vectors, args)
+    print(f"Rules chunks loaded     : {len(rules_vectors)}")
+    print(f"Live source chunks loaded: {len(live_vectors)}")
+    print(f"Rules FAISS index size  : {rules_index.ntotal} ({rules_info['factory']})")
+    print(f"Live FAISS index size   : {live_index.ntotal} ({live_info['factory']})")
+    print(f"Live URL index size     : {url_index.ntotal} ({url_info['factory']})")
+    print("✅ Embeddings and FAISS index saved successfully.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the rules and live-source FAISS indexes")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    build_stores(read_chunks(live=False), read_chunks(live=True), args)
+
+if __name__ == "__main__":
+    main()
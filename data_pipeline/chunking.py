@@ -1,17 +1,18 @@
+import sys
 import json
 import re
+import hashlib
 from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from helpers.records import read_records, stream_to
 
 data_dir = Path("data")
 extract_dir = data_dir / "extracted_text"
 chunks_dir = data_dir / "chunks"
 chunks_dir.mkdir(parents=True, exist_ok=True)
 
-input_files = {
-    "core_docs": extract_dir / "core_docs.json",
-    "circulars": extract_dir / "circulars.json",
-    "live_sources": extract_dir / "live_sources.json",
-}
+SOURCES = ["core_docs", "circulars", "live_sources"]
+input_files = {name: extract_dir / f"{name}.jsonl" for name in SOURCES}
 
 CHUNK_WORDS = 600
 OVERLAP_WORDS = 120
@@ -43,44 +44,51 @@ def chunk_by_words(text, chunk_size, overlap):
             chunks.append(" ".join(chunk_words))
     return chunks
 
-#Main splitting
-for source_name, input_file in input_files.items():
-    with open(input_file, "r", encoding="utf-8") as f:
-        records = json.load(f)
-    chunked_records = []
-    for rec in records:
-        text = rec.get("text", "").strip()
-        if not text:
-            continue
-        sections = split_into_sections(text)
-        for sec_idx, section in enumerate(sections, start=1):
-            section_chunks = chunk_by_words(
-                section,
-                CHUNK_WORDS,
-                OVERLAP_WORDS
-            )
-            for chunk_idx, chunk in enumerate(section_chunks, start=1):
-                chunk_record = {
-                    "chunk_id": (
-                        f"{rec['document_path'].replace('/', '_')}"
-                        f"_p{rec.get('page_number')}"
-                        f"_s{sec_idx}"
-                        f"_c{chunk_idx}"
-                    ),
-                    "document_path": rec.get("document_path"),
-                    "doc_category": rec.get("doc_category"),
-                    "rule_type": rec.get("rule_type"),
-                    "priority": rec.get("priority"),
-                    "authority": rec.get("authority"),
-                    "is_static": rec.get("is_static"),
-                    "effective_year": rec.get("effective_year"),
-                    "page_number": rec.get("page_number"),
-                    "section_index": sec_idx,
-                    "chunk_index": chunk_idx,
-                    "text": chunk
-                }
-                chunked_records.append(chunk_record)
-    output_file = chunks_dir / f"{source_name}_chunks.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(chunked_records, f, indent=2, ensure_ascii=False)
-    print(f"✅ {source_name}: {len(chunked_records)} chunks created")
\ No newline at end of file
+def chunk_record(rec):
+    text = rec.get("text", "").strip()
+    if not text:
+        return
+    sections = split_into_sections(text)
+    for sec_idx, section in enumerate(sections, start=1):
+        section_chunks = chunk_by_words(
+            section,
+            CHUNK_WORDS,
+            OVERLAP_WORDS
+        )
+        for chunk_idx, chunk in enumerate(section_chunks, start=1):
+            chunk_record = {
+                "chunk_id": (
+                    f"{rec['document_path'].replace('/', '_')}"
+                    f"_p{rec.get('page_number')}"
+                    f"_s{sec_idx}"
+                    f"_c{chunk_idx}"
+                ),
+                "document_path": rec.get("document_path"),
+                "doc_category": rec.get("doc_category"),
+                "rule_type": rec.get("rule_type"),
+                "priority": rec.get("priority"),
+                "authority": rec.get("authority"),
+                "is_static": rec.get("is_static"),
+                "effective_year": rec.get("effective_year"),
+                "page_number": rec.get("page_number"),
+                "section_index": sec_idx,
+                "chunk_index": chunk_idx,
+                "text": chunk
+            }
+            # Lets build_vector_store.py re-embed only new/changed chunks
+            payload = json.dumps(chunk_record, sort_keys=True, ensure_ascii=False)
+            chunk_record["content_hash"] = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+            yield chunk_record
+
+def chunk_stream(source_name, records):
+    """Chunks of a record stream, written to <source>_chunks.jsonl as they pass through."""
+    chunks = (chunk for rec in records for chunk in chunk_record(rec))
+    return stream_to(chunks_dir / f"{source_name}_chunks.jsonl", chunks)
+
+def main():
+    for source_name in SOURCES:
+        count = sum(1 for _ in chunk_stream(source_name, read_records(input_files[source_name])))
+        print(f"✅ {source_name}: {count} chunks created")
+
+if __name__ == "__main__":
+    main()
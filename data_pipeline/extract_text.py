@@ -1,12 +1,20 @@
+import os
 import json
 import re
+import hashlib
+import time
+import sqlite3
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor
+import sys
 from pathlib import Path
-from pypdf import PdfReader
 import pytesseract
 pytesseract.pytesseract.tesseract_cmd=r"D:\OCR\tesseract.exe"  # Give correct path
 import fitz
 from PIL import Image
 import io
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from helpers.records import stream_to
 
 base_dir=Path(__file__).parent.parent
 # print(base_dir)
@@ -19,6 +27,12 @@ metadata_file=raw_docs/"meta_data.json"
 
 output_dir=data/"extracted_text"
 output_dir.mkdir(parents=True,exist_ok=True)
+manifest_file=output_dir/"manifest.json"     # document -> content hash of the last extraction
+OCR_DPI=300
+MIN_PAGE_TEXT_CHARS=20     # less text than this on a page with images -> scanned page, OCR it
+TEXT_ENGINE="pymupdf"      # part of the cache key for text-layer pages
+# Extractor settings; changing any of them re-extracts every document
+EXTRACTOR=f"{TEXT_ENGINE}:ocr{OCR_DPI}:min{MIN_PAGE_TEXT_CHARS}"
 
 with open(metadata_file,"r",encoding="utf-8") as f:            # Reads core and circular folders metadata(custom made not program generated)
     file_metadata=json.load(f)
@@ -29,84 +43,252 @@ def clean_text(text):    #Converts to cleaned str
     text=re.sub(r"[ ]{2,} | \t+"," ",text)
     return text.strip()
 
-def ocr_pdf(pdf_path):   #Reads images in pdfs
-    doc = fitz.open(pdf_path)
-    pages_text = []
-    for i, page in enumerate(doc, start=1):
-        pix = page.get_pixmap(dpi=300)
-        img = Image.open(io.BytesIO(pix.tobytes("png")))
-        text = pytesseract.image_to_string(img, lang="eng")
+def ocr_page(pdf_path, page_no):   #Reads the image of one pdf page (runs in worker processes)
+    with fitz.open(pdf_path) as doc:
+        pix = doc[page_no - 1].get_pixmap(dpi=OCR_DPI)
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    return pytesseract.image_to_string(img, lang="eng")
+
+def page_method(page, text):   #"text", "ocr" (image-only/scanned page) or "empty"
+    if len(text.strip()) >= MIN_PAGE_TEXT_CHARS:
+        return "text"
+    if page.get_images(full=False):
+        return "ocr"
+    return "text" if text.strip() else "empty"
+
+def read_text_pages(pdf_path):   #One pass over the pdf: text layer and method of every page
+    texts, methods = [], []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text = page.get_text()
+            texts.append(text)
+            methods.append(page_method(page, text))
+    return texts, methods
+
+def read_text_page(pdf_path, page_no):
+    with fitz.open(pdf_path) as doc:
+        return doc[page_no - 1].get_text()
+
+def timed(fn, *args):   #Runs in workers; the duration feeds the cache's time-saved stats
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def make_record(pdf_path, relative_key, meta, page_no, text, method):
+    return {
+        "document_id": relative_key.replace("/", "__"),
+        "document_name": pdf_path.name,
+        "document_path": relative_key,
+        "doc_category": meta.get("doc_category"),
+        "rule_type": meta.get("rule_type"),
+        "priority": meta.get("priority"),
+        "authority": meta.get("authority"),
+        "description": meta.get("description"),
+        "is_static": meta.get("is_static"),
+        "effective_year": meta.get("effective_year"),
+        "page_number": page_no,
+        "text": clean_text(text),
+        "extraction_method": method
+    }
+
+def run_inline(fn, *args):   #Serial stand-in for executor.submit
+    future = Future()
+    future.set_result(fn(*args))
+    return future
+
+class PageCache:
+    """Extracted page text keyed by (pdf content hash, page, method, dpi), evicted LRU by size.
+
+    Only the main process touches it; workers just extract.
+    """
+    def __init__(self, path, max_bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                pdf_hash TEXT, page INTEGER, method TEXT, dpi INTEGER,
+                text TEXT, seconds REAL, size INTEGER, last_used REAL,
+                PRIMARY KEY (pdf_hash, page, method, dpi)
+            );
+            CREATE TABLE IF NOT EXISTS layouts (pdf_hash TEXT PRIMARY KEY, methods TEXT);
+        """)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    def layout(self, pdf_hash):
+        # Extraction method of every page from an earlier run
+        row = self.db.execute("SELECT methods FROM layouts WHERE pdf_hash=?", (pdf_hash,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_layout(self, pdf_hash, methods):
+        self.db.execute("INSERT OR REPLACE INTO layouts VALUES (?,?)", (pdf_hash, json.dumps(methods)))
+
+    def get(self, pdf_hash, page, method, dpi):
+        key = (pdf_hash, page, method, dpi)
+        row = self.db.execute(
+            "SELECT text, seconds FROM pages WHERE pdf_hash=? AND page=? AND method=? AND dpi=?", key
+        ).fetchone()
+        if row is None:
+            return None
+        self.db.execute(
+            "UPDATE pages SET last_used=? WHERE pdf_hash=? AND page=? AND method=? AND dpi=?", (time.time(),) + key
+        )
+        self.hits += 1
+        self.time_saved += row[1]
+        return row[0]
+
+    def put(self, pdf_hash, page, method, dpi, text, seconds):
+        self.misses += 1
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?,?,?,?,?,?,?,?)",
+            (pdf_hash, page, method, dpi, text, seconds, len(text.encode("utf-8")), time.time())
+        )
+
+    def evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        evicted = 0
+        for rowid, size in self.db.execute("SELECT rowid, size FROM pages ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM pages WHERE rowid=?", (rowid,))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def close(self):
+        evicted = self.evict()
+        self.db.commit()
+        size = self.db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM pages").fetchone()
+        self.db.close()
+        lookups = self.hits + self.misses
+        print("\nExtraction cache:")
+        print(f"  page hits / extracted : {self.hits} / {self.misses}"
+              f" (hit rate {self.hits / lookups:.1%})" if lookups else "  no pages looked up")
+        print(f"  time saved            : {self.time_saved:.1f}s")
+        print(f"  size                  : {size[1]} pages, {size[0] / 1e6:.1f} MB ({evicted} evicted)")
+
+def cache_key(method):   #(method, dpi) under which a page's text is cached
+    return ("ocr", OCR_DPI) if method == "ocr" else (TEXT_ENGINE, 0)
+
+def file_hash(pdf_path):
+    h=hashlib.sha256()
+    with open(pdf_path,"rb") as f:
+        for block in iter(lambda: f.read(1<<20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def document_hash(content_hash, relative_key):
+    # PDF bytes + its metadata entry + extractor settings: any change means re-extraction
+    h=hashlib.sha256(content_hash.encode("utf-8"))
+    h.update(EXTRACTOR.encode("utf-8"))
+    h.update(json.dumps(file_metadata.get(relative_key),sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+def load_previous(category_name):
+    # Byte range of each document's records in the last run's output; only
+    # the ranges of unchanged files are read back
+    path=output_dir/f"{category_name}.jsonl"
+    ranges={}
+    if path.exists():
+        with open(path,"rb") as f:
+            offset=0
+            for line in f:
+                key=json.loads(line)["document_path"]
+                start=ranges.get(key,(offset,))[0]
+                ranges[key]=(start,offset+len(line))
+                offset+=len(line)
+    return path,ranges
+
+def read_previous(path,span):
+    with open(path,"rb") as f:
+        f.seek(span[0])
+        lines=f.read(span[1]-span[0]).splitlines()
+    return [json.loads(line) for line in lines if line.strip()]
+
+def queue_pages(doc,submit,cache):   #Per-page method is known now: take cached pages, queue the rest
+    doc["pages"]={}
+    if "text" in doc:
+        (texts, doc["methods"]), seconds = doc["text"].result()
+        if cache:
+            cache.put_layout(f"{doc['content']}:{EXTRACTOR}", doc["methods"])
+        for page_no, (text, method) in enumerate(zip(texts, doc["methods"]), start=1):
+            if method == "text":
+                doc["pages"][page_no]=text
+                if cache:
+                    cache.put(doc["content"], page_no, TEXT_ENGINE, 0, text, seconds / len(texts))
+    doc["pending"]={}
+    for page_no, method in enumerate(doc["methods"], start=1):
+        if page_no in doc["pages"] or method == "empty":
+            continue
+        cached = cache.get(doc["content"], page_no, *cache_key(method)) if cache else None
+        if cached is not None:
+            doc["pages"][page_no]=cached
+        elif method == "ocr":
+            doc["pending"][page_no]=submit(timed, ocr_page, str(doc["path"]), page_no)
+        else:
+            doc["pending"][page_no]=submit(timed, read_text_page, str(doc["path"]), page_no)
+
+def collect_records(doc,cache):
+    for page_no, future in doc["pending"].items():
+        text, seconds = future.result()
+        if cache:
+            cache.put(doc["content"], page_no, *cache_key(doc["methods"][page_no - 1]), text, seconds)
+        doc["pages"][page_no]=text
+    records=[]
+    for page_no, method in enumerate(doc["methods"], start=1):
+        text = doc["pages"].get(page_no, "")
         if text.strip():
-            pages_text.append((i, text))
-    return pages_text
-
-def extract_pdf(pdf_path, relative_key):
-    records = []
-    meta = file_metadata.get(relative_key)
-    if not meta:
-        print(f"[WARNING] Metadata missing for {relative_key}")
-        return records
-    reader = PdfReader(str(pdf_path))
-    has_text = False
-    for page in reader.pages:
-        text = page.extract_text()
-        if text and text.strip():
-            has_text = True
-            break
-    if has_text:
-        for page_no, page in enumerate(reader.pages, start=1):
-            text = page.extract_text()
-            if not text:
-                continue
-            records.append({
-                "document_id": relative_key.replace("/", "__"),
-                "document_name": pdf_path.name,
-                "document_path": relative_key,
-                "doc_category": meta.get("doc_category"),
-                "rule_type": meta.get("rule_type"),
-                "priority": meta.get("priority"),
-                "authority": meta.get("authority"),
-                "description": meta.get("description"),
-                "is_static": meta.get("is_static"),
-                "effective_year": meta.get("effective_year"),
-                "page_number": page_no,
-                "text": clean_text(text),
-                "extraction_method": "text"
-            })
-    else:
-        ocr_pages = ocr_pdf(pdf_path)
-        if not ocr_pages:
-            print(f"[OCR FAILED] {relative_key}")
-        for page_no, ocr_text in ocr_pages:
-            records.append({
-                "document_id": relative_key.replace("/", "__"),
-                "document_name": pdf_path.name,
-                "document_path": relative_key,
-                "doc_category": meta.get("doc_category"),
-                "rule_type": meta.get("rule_type"),
-                "priority": meta.get("priority"),
-                "authority": meta.get("authority"),
-                "description": meta.get("description"),
-                "is_static": meta.get("is_static"),
-                "effective_year": meta.get("effective_year"),
-                "page_number": page_no,
-                "text": clean_text(ocr_text),
-                "extraction_method": "ocr"
-            })
+            records.append(make_record(doc["path"], doc["key"], doc["meta"], page_no, text, method))
+        elif method == "ocr":
+            print(f"[OCR FAILED] {doc['key']} page {page_no}")
     return records
 
+def finish_window(docs,submit,cache):
+    for doc in docs:
+        if "records" not in doc:
+            queue_pages(doc,submit,cache)
+    for doc in docs:
+        records=doc["records"] if "records" in doc else collect_records(doc,cache)
+        if not records:
+            print(f"[SKIPPED] No extractable text: {doc['key']}")
+        yield from records
 
-def process_folder(base_folder,category_name):
-    all_records=[]
-    for pdf_file in base_folder.rglob("*.pdf"):
+def process_folder(base_folder,category_name,manifest=None,executor=None,cache=None,window=8):
+    # Yields page records in sorted document/page order (stable chunk ids).
+    # Documents are handled in windows: their text reads, then their OCR
+    # pages, are fanned out to the pool, so memory is bounded by the window
+    # rather than the corpus. Each page is classified on its own, so only
+    # the scanned pages of a mixed document are OCR'd.
+    submit=executor.submit if executor else run_inline
+    manifest=manifest if manifest is not None else {}
+    previous_path,previous=load_previous(category_name)
+    docs=[]
+    for pdf_file in sorted(base_folder.rglob("*.pdf")):
         relative_path=pdf_file.relative_to(base_folder).as_posix()
         relative_key=f"{category_name}/{relative_path}"
-        print(f"Processing: {relative_key}")
-        records=extract_pdf(pdf_file, relative_key)    #Calls extract function
-        if not records:
-            print(f"[SKIPPED] No extractable text: {relative_key}")
-        all_records.extend(records)
-    return all_records
+        content=file_hash(pdf_file)
+        digest=document_hash(content, relative_key)
+        if manifest.get(relative_key)==digest and relative_key in previous:
+            print(f"Unchanged: {relative_key}")
+            docs.append({"key": relative_key, "records": read_previous(previous_path,previous[relative_key])})
+        else:
+            meta = file_metadata.get(relative_key)
+            if not meta:
+                print(f"[WARNING] Metadata missing for {relative_key}")
+                continue
+            print(f"Processing: {relative_key}")
+            manifest[relative_key]=digest
+            doc={"key": relative_key, "path": pdf_file, "meta": meta, "content": content}
+            doc["methods"]=cache.layout(f"{content}:{EXTRACTOR}") if cache else None
+            if doc["methods"] is None:
+                doc["text"]=submit(timed, read_text_pages, str(pdf_file))
+            docs.append(doc)
+        if len(docs)>=window:
+            yield from finish_window(docs,submit,cache)
+            docs=[]
+    yield from finish_window(docs,submit,cache)
 
 def process_live_sources():
     with open(live_sources_file,"r",encoding="utf-8") as f:
@@ -129,14 +311,60 @@ def process_live_sources():
         records.append(record)
     return records
 
+def add_arguments(parser):
+    parser.add_argument("--workers",type=int,default=os.cpu_count() or 1,help="processes for PDF parsing and OCR (1 = serial)")
+    parser.add_argument("--cache-dir",default=str(data/"cache"),help="per-page extraction cache location")
+    parser.add_argument("--cache-max-mb",type=float,default=512,help="cache size limit (least recently used pages evicted)")
+    parser.add_argument("--no-cache",action="store_true",help="extract every page again")
+
+class Extraction:
+    """Extraction run shared by the category streams: pool, page cache and manifest."""
+    def __init__(self,args):
+        self.cache=None if args.no_cache else PageCache(Path(args.cache_dir)/"page_text.sqlite", int(args.cache_max_mb*1e6))
+        self.manifest={}
+        if manifest_file.exists():
+            with open(manifest_file,"r",encoding="utf-8") as f:
+                self.manifest=json.load(f)
+        self.executor=ProcessPoolExecutor(max_workers=args.workers) if args.workers>1 else None
+        self.window=max(8,2*args.workers)
+        self.extracted=set()
+
+    def stream(self,category_name):
+        # Records of one category, written to <category>.jsonl as they pass through
+        base_folder=core_docs if category_name=="core_docs" else circulars
+        records=process_folder(base_folder,category_name,self.manifest,self.executor,self.cache,self.window)
+        for rec in stream_to(output_dir/f"{category_name}.jsonl",records):
+            self.extracted.add(rec["document_path"])
+            yield rec
+
+    def live_sources(self):
+        return stream_to(output_dir/"live_sources.jsonl",process_live_sources())
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+        if self.cache:
+            self.cache.close()
+
+    def save_manifest(self):   #Only after a complete run, else unwritten documents would look unchanged
+        # Deleted documents drop out of the manifest
+        manifest={k:v for k,v in self.manifest.items() if k in self.extracted}
+        with open(manifest_file,"w",encoding="utf-8") as f:
+            json.dump(manifest,f,indent=2,ensure_ascii=False)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description="Extract text from railway PDFs")
+    add_arguments(parser)
+    args=parser.parse_args(argv)
+    run=Extraction(args)
+    try:
+        for category_name in ("core_docs","circulars"):
+            print(f"{category_name}: {sum(1 for _ in run.stream(category_name))} pages")
+        print(f"live_sources: {sum(1 for _ in run.live_sources())} records")
+        run.save_manifest()
+    finally:
+        run.close()
+    print("\n✅ Document ingestion completed successfully.")
+
 if __name__=="__main__":
-    core_records=process_folder(core_docs,"core_docs")
-    circular_records=process_folder(circulars,"circulars")
-    live_records=process_live_sources()
-    with open(output_dir/"core_docs.json","w",encoding="utf-8") as f:
-        json.dump(core_records,f,indent=2,ensure_ascii=False)
-    with open(output_dir/"circulars.json","w",encoding="utf-8") as f:
-        json.dump(circular_records,f,indent=2,ensure_ascii=False)
-    with open(output_dir/"live_sources.json","w",encoding="utf-8") as f:
-        json.dump(live_records,f,indent=2,ensure_ascii=False)
-    print("\n✅ Document ingestion completed successfully.")
\ No newline at end of file
+    main()
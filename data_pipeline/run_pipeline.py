@@ -0,0 +1,27 @@
+# PDFs -> page records -> chunks -> FAISS indexes as one streaming pass.
+# Each stage still writes its usual JSONL file as records flow through it,
+# so the stages can also be re-run one at a time.
+import argparse
+import itertools
+import extract_text
+import chunking
+import build_vector_store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract, chunk and embed the railway documents in one pass")
+    extract_text.add_arguments(parser)
+    build_vector_store.add_arguments(parser)
+    args = parser.parse_args(argv)
+    run = extract_text.Extraction(args)
+    try:
+        rules_chunks = itertools.chain.from_iterable(
+            chunking.chunk_stream(name, run.stream(name)) for name in ("core_docs", "circulars")
+        )
+        live_chunks = chunking.chunk_stream("live_sources", run.live_sources())
+        build_vector_store.build_stores(rules_chunks, live_chunks, args)
+        run.save_manifest()
+    finally:
+        run.close()
+
+if __name__ == "__main__":
+    main()
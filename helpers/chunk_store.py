@@ -0,0 +1,135 @@
+# Columnar on-disk chunk metadata: numeric/category columns are memory-mapped
+# .npy arrays, strings (chunk text, ids) live in a byte blob read by offset
+import os
+import json
+import shutil
+from pathlib import Path
+import numpy as np
+
+INT_NULL = np.iinfo("int64").min
+
+# Column kinds: "int" (nullable int64), "bool" (int8, -1 = None),
+# "cat" (int32 codes into a value list, -1 = None), "str" (blob + offsets)
+CHUNK_SCHEMA = {
+    "chunk_id": "str",
+    "document_path": "cat",
+    "doc_category": "cat",
+    "rule_type": "cat",
+    "priority": "int",
+    "page_number": "int",
+    "section_index": "int",
+    "authority": "cat",
+    "is_static": "bool",
+    "effective_year": "int",
+    "text": "str",
+    "content_hash": "str",
+    "vector_id": "int",
+}
+URL_SCHEMA = {
+    "url": "str",
+    "authority": "cat",
+    "description": "str",
+}
+
+class ChunkStoreWriter:
+    """Appends rows one at a time; strings go straight to disk, columns are written on close()."""
+    def __init__(self, path, schema):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        self.tmp.mkdir(parents=True)
+        self.schema = schema
+        self.count = 0
+        self.columns = {name: [] for name in schema}
+        self.categories = {name: {} for name, kind in schema.items() if kind == "cat"}
+        self.blobs = {}
+        for name, kind in schema.items():
+            if kind == "str":
+                self.blobs[name] = open(self.tmp / f"{name}.bin", "wb")
+                self.columns[name].append(0)
+
+    def add(self, row: dict):
+        for name, kind in self.schema.items():
+            value = row.get(name)
+            if kind == "str":
+                data = (value or "").encode("utf-8")
+                self.blobs[name].write(data)
+                self.columns[name].append(self.columns[name][-1] + len(data))
+            elif kind == "cat":
+                codes = self.categories[name]
+                if value is None:
+                    self.columns[name].append(-1)
+                else:
+                    self.columns[name].append(codes.setdefault(value, len(codes)))
+            elif kind == "bool":
+                self.columns[name].append(-1 if value is None else int(bool(value)))
+            else:
+                self.columns[name].append(INT_NULL if value is None else int(value))
+        self.count += 1
+
+    def close(self):
+        dtypes = {"str": "int64", "cat": "int32", "bool": "int8", "int": "int64"}
+        for name, kind in self.schema.items():
+            suffix = ".offsets.npy" if kind == "str" else ".npy"
+            np.save(self.tmp / f"{name}{suffix}", np.array(self.columns[name], dtype=dtypes[kind]))
+        for f in self.blobs.values():
+            f.close()
+        with open(self.tmp / "schema.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "count": self.count,
+                "columns": self.schema,
+                "categories": {name: list(codes) for name, codes in self.categories.items()},
+            }, f, indent=2, ensure_ascii=False)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp, self.path)
+        return self.count
+
+class ChunkStore:
+    """Read side: opening maps the column files; a row's strings are decoded only when asked for."""
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "schema.json", "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self.count = info["count"]
+        self.schema = info["columns"]
+        self.categories = info["categories"]
+        self._columns = {}
+        self._blobs = {}
+        for name, kind in self.schema.items():
+            if kind == "str":
+                self._columns[name] = np.load(self.path / f"{name}.offsets.npy", mmap_mode="r")
+                blob = self.path / f"{name}.bin"
+                # np.memmap cannot map an empty file
+                self._blobs[name] = np.memmap(blob, dtype="uint8", mode="r") if blob.stat().st_size else b""
+            else:
+                self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+
+    @staticmethod
+    def exists(path) -> bool:
+        return (Path(path) / "schema.json").exists()
+
+    def __len__(self):
+        return self.count
+
+    def column(self, name):
+        """Raw column array (codes for "cat", offsets for "str")."""
+        return self._columns[name]
+
+    def value(self, name, row):
+        kind = self.schema[name]
+        raw = self._columns[name][row]
+        if kind == "str":
+            end = self._columns[name][row + 1]
+            return bytes(self._blobs[name][raw:end]).decode("utf-8")
+        if kind == "cat":
+            return None if raw < 0 else self.categories[name][raw]
+        if kind == "bool":
+            return None if raw < 0 else bool(raw)
+        return None if raw == INT_NULL else int(raw)
+
+    def row(self, row, fields=None) -> dict:
+        return {name: self.value(name, row) for name in (fields or self.schema)}
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield self.row(row)
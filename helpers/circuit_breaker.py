@@ -0,0 +1,52 @@
+# Per-endpoint circuit breaker: stop calling an endpoint that keeps failing
+import time
+import threading
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures.
+
+    While open, allow() is False; after reset_seconds a single trial call is
+    let through (half-open) and its outcome closes or re-opens the breaker.
+    A trial that never reports back (cancelled, unexpected error) expires
+    after another reset_seconds and the next call becomes the trial.
+    """
+    def __init__(self, failure_threshold=3, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._trial_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._trial else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if self._trial and now - self._trial_at < self.reset_seconds:
+                return False
+            if self._trial or now - self._opened_at >= self.reset_seconds:
+                self._trial = True
+                self._trial_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
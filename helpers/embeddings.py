@@ -0,0 +1,81 @@
+# Shared query encoder (one model per process, LRU + optional disk cache)
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+# Disk tier is off unless a directory is given
+DISK_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+
+model = None   # loaded by get_model() on first use (startup warmup times it)
+_model_lock = threading.Lock()
+_cache = OrderedDict()
+_lock = threading.Lock()
+stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+def get_model():
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(MODEL_NAME)
+    return model
+
+def normalize_query(query: str) -> str:
+    # MiniLM is uncased, so case and spacing don't change the vector
+    return " ".join(query.lower().split())
+
+def _disk_path(key: str):
+    if not DISK_CACHE_DIR:
+        return None
+    digest = hashlib.sha1(f"{MODEL_NAME}|{key}".encode("utf-8")).hexdigest()
+    return Path(DISK_CACHE_DIR) / digest[:2] / f"{digest}.npy"
+
+def _remember(key, vector):
+    with _lock:
+        _cache[key] = vector
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def encode_query(query: str):
+    """Returns a (1, dim) float32 normalized embedding, encoding each query once."""
+    key = normalize_query(query)
+    with _lock:
+        vector = _cache.get(key)
+        if vector is not None:
+            _cache.move_to_end(key)
+            stats["hits"] += 1
+            return vector
+    path = _disk_path(key)
+    if path is not None and path.exists():
+        try:
+            vector = np.load(path)
+            vector.setflags(write=False)
+            stats["disk_hits"] += 1
+            _remember(key, vector)
+            return vector
+        except Exception:
+            pass
+    vector = get_model().encode(
+        [key],
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    ).astype("float32")
+    vector.setflags(write=False)
+    stats["misses"] += 1
+    _remember(key, vector)
+    if path is not None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp.npy")
+            np.save(tmp, vector)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    return vector
@@ -0,0 +1,140 @@
+# Deterministic entity extraction for live-data queries ("PNR 4521789632",
+# "live status 12951"): regexes plus the local station index, same JSON
+# schema as ENTITY_PROMPT in modules/live_data_apis.py
+import re
+from datetime import datetime, timezone, timedelta
+from helpers.fuzzy_lookup import TRAIN_STOPWORDS
+
+PNR_RE = re.compile(r"(?<!\d)\d{10}(?!\d)")
+TRAIN_RE = re.compile(r"(?<!\d)\d{5}(?!\d)")
+DATE_RE = re.compile(r"(?<!\d)(\d{1,2}[-/]\d{1,2}[-/]\d{4}|\d{4}-\d{1,2}-\d{1,2})(?!\d)")
+HOURS_RE = re.compile(r"\b(\d{1,2})\s*(?:hours?|hrs?)\b")
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z.]*")
+RELATIVE_DAYS = {"day after tomorrow": 2, "tomorrow": 1, "today": 0}
+
+# Phrase -> class code; codes themselves are matched as written
+CLASS_WORDS = {
+    "first ac": "1A", "1st ac": "1A", "ac first class": "1A",
+    "second ac": "2A", "2nd ac": "2A", "ac 2 tier": "2A", "2 tier": "2A",
+    "third ac": "3A", "3rd ac": "3A", "ac 3 tier": "3A", "3 tier": "3A",
+    "3 economy": "3E", "ac economy": "3E",
+    "sleeper": "SL", "chair car": "CC", "executive chair": "EC",
+    "second sitting": "2S", "first class": "FC",
+}
+CLASS_CODES = {"1A", "2A", "3A", "3E", "SL", "CC", "EC", "2S", "FC"}
+QUOTA_WORDS = {
+    "premium tatkal": "PT", "tatkal": "TQ", "ladies": "LD",
+    "senior citizen": "SS", "lower berth": "SS", "general quota": "GN",
+}
+QUOTA_CODES = {"GN", "TQ", "PT", "LD", "SS"}
+
+# Checked in order, first match wins; None = ask the LLM
+INTENT_RULES = [
+    ("pnr_status", r"\bpnr\b"),
+    ("fare_enquiry", r"\b(fare|fares|ticket price|ticket cost|how much)\b"),
+    ("seat_availability", r"\b(seat|seats|berth|berths|availability|available)\b"),
+    ("train_schedule", r"\b(schedule|timetable|time table|route|stops|halts)\b"),
+    ("live_station", r"\b(arrivals?|departures?|arriving|departing|live station|next \d+ ?(hours?|hrs?))\b"),
+    ("train_live_status", r"\b(live|running status|status|where is|where's|late|delay|delayed|reached|current location)\b"),
+]
+# Single words that are never read as a station
+NOT_STATIONS = TRAIN_STOPWORDS | {"pnr", "trains", "between", "on", "by", "passing", "through", "ac", "class", "quota"}
+
+def relative_date(text: str):
+    for phrase, days in RELATIVE_DAYS.items():
+        if re.search(rf"\b{phrase}\b", text):
+            # Same clock as the default journey date in build_entity
+            return (datetime.now(timezone.utc) + timedelta(days=days)).strftime("%d-%m-%Y")
+    return None
+
+def find_class(query: str, lower: str):
+    for phrase, code in CLASS_WORDS.items():
+        if re.search(rf"\b{phrase}\b", lower):
+            return code
+    for token in re.findall(r"\b[0-9A-Za-z]{2}\b", query):
+        if token.upper() in CLASS_CODES and (token.isupper() or token[0].isdigit()):
+            return token.upper()
+    return None
+
+def find_quota(query: str, lower: str):
+    for phrase, code in QUOTA_WORDS.items():
+        if re.search(rf"\b{phrase}\b", lower):
+            return code
+    m = re.search(r"\b([A-Z]{2})\s+quota\b", query, re.IGNORECASE)
+    if m and m.group(1).upper() in QUOTA_CODES:
+        return m.group(1).upper()
+    return None
+
+def find_stations(query: str, index, reserved, max_words=4):
+    """[(name as written, word before it)] for spans that exactly match the station index."""
+    words = WORD_RE.findall(query)
+    spans = []
+    i = 0
+    while i < len(words):
+        for n in range(min(max_words, len(words) - i), 0, -1):
+            span = words[i:i + n]
+            text = " ".join(span)
+            if n == 1:
+                token = span[0].strip(".")
+                if token.lower() in NOT_STATIONS or token.upper() in reserved or len(token) < 2:
+                    continue
+                # Codes count only when typed in capitals ("NDLS"), names need 3+ letters
+                is_code = token.isupper() and token in index.codes
+                if not is_code and (len(token) < 3 or index.key(token) not in index.exact):
+                    continue
+            elif index.key(text) not in index.exact or span[0].lower() in NOT_STATIONS:
+                continue
+            spans.append((text, words[i - 1].lower() if i else ""))
+            i += n
+            break
+        else:
+            i += 1
+    return spans
+
+def journey_from(spans):
+    # "from X to Y", "between X and Y", "X to Y"
+    src = next((s for s, prev in spans if prev in ("from", "between")), None)
+    dst = next((s for s, prev in spans if prev in ("to", "and")), None)
+    if dst and not src:
+        names = [s for s, _ in spans]
+        before = names[:names.index(dst)]
+        src = before[-1] if before else None
+    return {"from": src, "to": dst}
+
+def detect_intent(lower: str, parsed: dict):
+    if parsed["pnr_numbers"]:
+        return "pnr_status"
+    for intent, pattern in INTENT_RULES:
+        if re.search(pattern, lower):
+            return intent
+    journey = parsed["journey"]
+    if journey["from"] and journey["to"]:
+        return "trains_between_stations"
+    # A second station that did not resolve locally is not a by-station query
+    if len(parsed["stations"]) == 1 and re.search(r"\btrains?\b", lower) and not re.search(r"\b(to|between)\b", lower):
+        return "trains_by_station"
+    return "unknown"
+
+def extract_entities(query: str, station_index) -> dict:
+    """ENTITY_PROMPT-shaped dict; fields not found are null / empty."""
+    query = query or ""
+    lower = query.lower()
+    pnrs = PNR_RE.findall(query)
+    date = DATE_RE.search(query)
+    hours = HOURS_RE.search(lower)
+    class_type = find_class(query, lower)
+    quota = find_quota(query, lower)
+    reserved = CLASS_CODES | QUOTA_CODES | {"PNR"}
+    spans = find_stations(query, station_index, reserved)
+    parsed = {
+        "train_numbers": TRAIN_RE.findall(PNR_RE.sub(" ", query)),
+        "pnr_numbers": pnrs,
+        "stations": [s for s, _ in spans],
+        "journey": journey_from(spans),
+        "date": date.group(1) if date else relative_date(lower),
+        "class_type": class_type,
+        "quota": quota,
+        "hours": int(hours.group(1)) if hours else None,
+    }
+    parsed["intent"] = detect_intent(lower, parsed)
+    return parsed
@@ -0,0 +1,288 @@
+# In-memory fuzzy name -> value index (station codes, train numbers):
+# exact/alias match, prefix completion, then trigram search re-ranked by edit similarity
+import re
+import json
+import math
+from bisect import bisect_left
+from difflib import SequenceMatcher
+import numpy as np
+
+# Token spellings folded together before matching
+STATION_SYNONYMS = {
+    "junction": "jn", "jct": "jn", "jn.": "jn",
+    "cantonment": "cantt", "cant": "cantt",
+    "road": "rd",
+    "terminus": "t", "terminal": "t", "trm": "t",
+    "central": "ctrl", "cntl": "ctrl",
+    "city": "cty",
+    "station": "", "stn": "", "railway": "", "rly": "",
+}
+TRAIN_SYNONYMS = {
+    "express": "exp", "exp.": "exp", "e": "exp",
+    "superfast": "sf", "special": "spl", "passenger": "pass",
+    "mail": "ml", "train": "",
+}
+# Tokens users usually leave out ("ernakulam" for "ernakulam jn")
+OPTIONAL_TOKENS = {"jn"}
+NON_WORD = re.compile(r"[^a-z0-9 ]+")
+# Words after these name a place ("from howrah", "at pune"), not a train
+PLACE_MARKERS = {"from", "to", "at", "between", "and", "via"}
+# Query words that never identify a train
+TRAIN_STOPWORDS = {
+    "from", "to", "the", "a", "of", "for", "in", "at", "is", "and", "between", "via",
+    "train", "trains", "no", "number", "status", "running", "live", "current", "where",
+    "schedule", "timetable", "seat", "seats", "availability", "fare", "today", "tomorrow",
+    "now", "my", "what", "when", "which", "will", "does", "reach", "arrive", "late", "show", "check",
+}
+
+def normalize(text: str, synonyms=None) -> str:
+    synonyms = synonyms or {}
+    words = NON_WORD.sub(" ", (text or "").lower()).split()
+    words = [synonyms.get(w, w) for w in words]
+    return " ".join(w for w in words if w)
+
+def trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FuzzyIndex:
+    """Resolves free-text names to values; lookup() returns None unless a match is confident."""
+    def __init__(self, entries: dict, aliases=None, codes=None, synonyms=None, min_score=0.85, shortlist=8):
+        self.synonyms = synonyms or {}
+        self.min_score = min_score
+        self.shortlist = shortlist
+        self.codes = {c.upper(): c for c in (codes or [])}
+        self.exact = {}
+        for name, value in entries.items():
+            self.exact.setdefault(self.key(name), value)
+        for name, value in entries.items():
+            short = " ".join(w for w in self.key(name).split() if w not in OPTIONAL_TOKENS)
+            if short:
+                self.exact.setdefault(short, value)
+        # Aliases never shadow a real name
+        for name, value in (aliases or {}).items():
+            self.exact.setdefault(self.key(name), value)
+        self.keys = list(self.exact)
+        self.values = [self.exact[k] for k in self.keys]
+        # Prefix completion over names in typed (not sorted) word order
+        typed = sorted((self.normalize(name), value) for name, value in entries.items())
+        self.typed_names = [n for n, _ in typed]
+        self.typed_values = [v for _, v in typed]
+        # Trigram postings: trigram -> int32 array of key ids
+        postings = {}
+        self.key_grams = np.zeros(len(self.keys), dtype="int32")
+        for i, k in enumerate(self.keys):
+            grams = trigrams(k)
+            self.key_grams[i] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self.postings = {g: np.array(ids, dtype="int32") for g, ids in postings.items()}
+
+    @classmethod
+    def from_file(cls, path, synonyms=None, **kwargs):
+        # File written by build_static_lookup.py: {"entries", "aliases", "codes"}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["entries"], data.get("aliases"), data.get("codes"), synonyms, **kwargs)
+
+    def normalize(self, text: str) -> str:
+        return normalize(text, self.synonyms)
+
+    def key(self, text: str) -> str:
+        # Word order does not matter
+        return " ".join(sorted(self.normalize(text).split()))
+
+    def search(self, query: str, limit=5):
+        """Ranked [(value, key, score)] candidates, best first (score 1.0 = exact)."""
+        key = self.key(query)
+        if not key:
+            return []
+        if key in self.exact:
+            return [(self.exact[key], key, 1.0)]
+        grams = [self.postings[g] for g in trigrams(key) if g in self.postings]
+        if not grams:
+            return []
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.keys))
+        dice = 2 * shared / (self.key_grams + len(trigrams(key)))
+        # Trigrams shortlist, edit similarity decides
+        n = min(self.shortlist, len(dice))
+        top = np.argpartition(-dice, n - 1)[:n]
+        ranked = {}
+        for i in top:
+            if shared[i] == 0:
+                continue
+            score = round(SequenceMatcher(None, key, self.keys[i]).ratio(), 4)
+            value = self.values[i]
+            if score > ranked.get(value, (None, -1))[1]:
+                ranked[value] = (self.keys[i], score)
+        results = sorted(((v, k, s) for v, (k, s) in ranked.items()), key=lambda x: -x[2])
+        return results[:limit]
+
+    def complete(self, query: str):
+        # Unique value among names starting with the query, else None
+        prefix = self.normalize(query)
+        if len(prefix) < 4:
+            return None
+        start = bisect_left(self.typed_names, prefix)
+        values = set()
+        for i in range(start, len(self.typed_names)):
+            if not self.typed_names[i].startswith(prefix):
+                break
+            values.add(self.typed_values[i])
+            if len(values) > 1:
+                return None
+        return values.pop() if values else None
+
+    def lookup(self, query: str):
+        if not query:
+            return None
+        key = self.key(query)
+        if key in self.exact:
+            return self.exact[key]
+        code = query.strip().upper()
+        if code in self.codes:
+            return self.codes[code]
+        completed = self.complete(query)
+        if completed:
+            return completed
+        results = self.search(query, limit=2)
+        if not results or results[0][2] < self.min_score:
+            return None
+        # A near tie between different values is ambiguous
+        if len(results) > 1 and results[0][2] - results[1][2] < 0.03:
+            return None
+        return results[0][0]
+
+def pair_number(number: str):
+    # Up/down trains are numbered in pairs: 12625/12626
+    n = int(number)
+    return str(n + 1 if n % 2 else n - 1).zfill(len(number))
+
+class TrainSearch:
+    """Ranks trains for free text ("rajdhani from howrah") without any API call.
+
+    A train scores by the idf-weighted share of its name tokens found in the
+    query (typos via a token-level FuzzyIndex) plus its endpoint stations
+    mentioned in the query.
+    """
+    def __init__(self, trains, min_score=0.65, min_margin=0.1):
+        # trains: [{"number", "names": [...], "from": station name/code list, "to": ...}]
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.trains = trains
+        self.tokens = []
+        self.ends = []
+        by_token = {}
+        for i, t in enumerate(trains):
+            tokens = {w for name in t["names"] for w in normalize(name, TRAIN_SYNONYMS).split()}
+            self.tokens.append(tokens)
+            # Each endpoint matches by station name or code: [{name tokens}, {code}]
+            self.ends.append([
+                [set(normalize(x, STATION_SYNONYMS).split()) - OPTIONAL_TOKENS for x in t.get(end) or []]
+                for end in ("from", "to")
+            ])
+            for w in tokens:
+                by_token.setdefault(w, []).append(i)
+        n = max(len(trains), 1)
+        self.idf = {w: math.log(n / len(ids)) + 1 for w, ids in by_token.items()}
+        self.max_idf = math.log(n) + 1
+        # Generic words (exp, sf, ...) rank trains but never select them
+        generic = set(TRAIN_SYNONYMS.values())
+        self.by_token = {w: ids for w, ids in by_token.items() if w not in generic and not w.isdigit()}
+        self.vocab = FuzzyIndex({w: w for w in self.by_token})
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        # trains_index.json written by build_static_lookup.py
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    @classmethod
+    def from_lookup(cls, lookup: dict, **kwargs):
+        # name -> number lookup only (no endpoint stations). It keeps one number
+        # per name, so a train whose up/down partner is missing may share its
+        # name with it: never picked alone.
+        names = {}
+        for name, number in lookup.items():
+            names.setdefault(number, []).append(name)
+        return cls([
+            {"number": num, "names": n, "paired": pair_number(num) not in names}
+            for num, n in names.items()
+        ], **kwargs)
+
+    def _rank(self, query: str, min_score=0.0):
+        # [(score, train index, naming tokens matched, endpoints matched)], best first
+        all_words = normalize(query, TRAIN_SYNONYMS).split()
+        # Words of the query outside place phrases (a word may be both: "chennai express to chennai")
+        free, in_place = set(), False
+        for w in all_words:
+            if w in PLACE_MARKERS:
+                in_place = True
+            elif w in TRAIN_STOPWORDS:
+                in_place = False
+            elif not in_place:
+                free.add(w)
+        words = [w for w in all_words if w not in TRAIN_STOPWORDS]
+        # Query word -> index token (typos fixed); unknown words weigh the most
+        tokens = {}
+        for w in words:
+            if w in self.idf:
+                tokens[w] = w
+            elif len(w) >= 4:
+                tokens[w] = self.vocab.lookup(w)
+        matched = {t for t in tokens.values() if t}
+        naming = {t for w, t in tokens.items() if t and w in free and t in self.by_token}
+        candidates = {i for t in naming for i in self.by_token[t]}
+        place_words = set(normalize(query, STATION_SYNONYMS).split())
+        weights = {w: self.idf.get(tokens.get(w), self.max_idf) for w in words}
+        total = sum(weights.values()) or 1.0
+        scored = []
+        for i in candidates:
+            name_tokens = self.tokens[i]
+            name_cov = sum(self.idf[t] for t in name_tokens & matched) / sum(self.idf[t] for t in name_tokens)
+            ends = [next(alt for alt in end if alt and alt <= place_words)
+                    for end in self.ends[i] if any(alt and alt <= place_words for alt in end)]
+            end_words = set().union(*ends)
+            explained = sum(wt for w, wt in weights.items() if tokens.get(w) in name_tokens or w in end_words)
+            score = round(0.6 * name_cov + 0.3 * explained / total + 0.05 * len(ends), 4)
+            if score >= min_score:
+                scored.append((score, i, naming & name_tokens, len(ends)))
+        scored.sort(key=lambda x: (-x[0], self.trains[x[1]]["number"]))
+        return scored
+
+    def search(self, query: str, limit=5, min_score=0.0):
+        """Ranked [{"train_number", "name", "score"}], best first.
+
+        A train must match some word outside the place phrases ("from X to Y")
+        so a station alone never selects one.
+        """
+        return [
+            {
+                "train_number": self.trains[i]["number"],
+                "name": self.trains[i]["names"][0].upper(),
+                "score": score
+            }
+            for score, i, _, _ in self._rank(query, min_score)[:limit]
+        ]
+
+    def candidates(self, query: str, limit=5):
+        # Suggestions for an ambiguous name: only reasonably close matches
+        return self.search(query, limit, min_score=0.75 * self.min_score)
+
+    def best(self, query: str):
+        """Train number of a clear winner, else None.
+
+        The winner must also be the only train matching its naming words with
+        as many endpoints: "intercity" alone names dozens of trains.
+        """
+        ranked = self._rank(query)
+        if not ranked or ranked[0][0] < self.min_score:
+            return None
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < self.min_margin:
+            return None
+        _, i, hits, n_ends = ranked[0]
+        if self.trains[i].get("paired"):
+            return None
+        if any(hits <= other_hits and other_ends >= n_ends for _, j, other_hits, other_ends in ranked if j != i):
+            return None
+        return self.trains[i]["number"]
@@ -0,0 +1,33 @@
+# JSON Lines record files shared by the data pipeline stages and the retrievers
+import os
+import json
+from pathlib import Path
+
+def read_records(path):
+    """Yields the records of a .jsonl file one at a time (a legacy .json array is read whole)."""
+    path = Path(path)
+    legacy = path.with_suffix(".json")
+    if not path.exists() and legacy.exists():
+        with open(legacy, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def stream_to(path, records):
+    """Writes records to path while passing them on; path is replaced once the stream is exhausted."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            yield rec
+    os.replace(tmp, path)
+
+def write_records(path, records) -> int:
+    count = 0
+    for _ in stream_to(path, records):
+        count += 1
+    return count
@@ -0,0 +1,49 @@
+# Per-request state shared by all modules tried for one query
+import asyncio
+from helpers.embeddings import encode_query
+
+class QueryContext:
+    """Carries intermediate results of one query; each is computed lazily, at most once."""
+    def __init__(self, query: str):
+        self.query = query
+        self.route = None
+        self.entities = None
+        self._embedding = None
+        self._rules = None
+        self._sources = None
+        self._sources_k = 0
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            self._embedding = encode_query(self.query)
+        return self._embedding
+
+    async def aembedding(self):
+        # Encoding is CPU-bound, keep it off the event loop
+        if self._embedding is None:
+            await asyncio.to_thread(lambda: self.embedding)
+        return self._embedding
+
+    def rules(self):
+        if self._rules is None:
+            from modules.railway_rag.retrieval_engine import retrieve_rules
+            self._rules = retrieve_rules(self.query, query_embedding=self.embedding)
+        return self._rules
+
+    def live_sources(self, top_k: int = 2):
+        # Hits are ranked, so a smaller top_k is a prefix of a larger one
+        if self._sources is None or top_k > self._sources_k:
+            from helpers.live_sources import retrieve_live_sources
+            self._sources = retrieve_live_sources(
+                self.query,
+                top_k=top_k,
+                query_embedding=self.embedding
+            )
+            self._sources_k = top_k
+        return self._sources[:top_k]
+
+    async def arules(self):
+        if self._rules is None:
+            await asyncio.to_thread(self.rules)
+        return self._rules
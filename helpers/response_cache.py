@@ -0,0 +1,84 @@
+# TTL cache for (data, headers) API responses with stale-while-revalidate
+import time
+import json
+import threading
+from collections import OrderedDict
+from requests.structures import CaseInsensitiveDict
+
+class ResponseCache:
+    """LRU of successful responses keyed by path + normalized params.
+
+    lookup() says whether an entry is "fresh" (within ttl), "stale" (within
+    ttl + stale_ttl: serve it and refresh in the background) or "expired".
+    Returned headers carry X-Cache: hit/stale so callers can label the data.
+    """
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (data, headers, stored_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path, params):
+        normalized = {k: str(v).strip().lower() for k, v in (params or {}).items() if v is not None}
+        return path + "?" + json.dumps(normalized, sort_keys=True)
+
+    def lookup(self, key, ttl, stale_ttl=0):
+        """Returns (state, data, headers); state is None when nothing is cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None, None
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry[2]
+            if age <= ttl:
+                state = "fresh"
+                self.hits += 1
+            elif age <= ttl + stale_ttl:
+                state = "stale"
+                self.stale_hits += 1
+            else:
+                state = "expired"
+                self.misses += 1
+        headers = CaseInsensitiveDict(entry[1] or {})
+        headers["X-Cache"] = "hit" if state == "fresh" else "stale"
+        return state, entry[0], headers
+
+    def store(self, key, data, headers):
+        if not data:
+            return
+        with self._lock:
+            self._entries[key] = (data, CaseInsensitiveDict(headers or {}), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def start_refresh(self, key) -> bool:
+        # Only one background refresh per key at a time
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / total, 3) if total else 0.0
+        }
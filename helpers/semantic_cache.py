@@ -0,0 +1,79 @@
+# Embedding-keyed cache: near-duplicate queries share a stored value
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class SemanticCache:
+    """LRU + TTL cache looked up by cosine distance between normalized embeddings.
+
+    An optional tag must match exactly for a hit (e.g. an index version).
+    """
+    def __init__(self, max_entries=512, ttl_seconds=3600, max_distance=0.05):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # id -> (vector, value, tag, created)
+        self._next_id = 0
+        self._matrix = None
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        if self.ttl_seconds is None:
+            return
+        expired = [k for k, e in self._entries.items() if now - e[3] > self.ttl_seconds]
+        for k in expired:
+            del self._entries[k]
+        if expired:
+            self._matrix = None
+
+    def _search_matrix(self):
+        if self._matrix is None:
+            self._ids = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[k][0] for k in self._ids])
+        return self._matrix
+
+    def get(self, embedding, tag=None):
+        vector = np.asarray(embedding, dtype="float32").reshape(-1)
+        with self._lock:
+            self._expire(time.monotonic())
+            if self._entries:
+                sims = self._search_matrix() @ vector
+                for pos in np.argsort(-sims):
+                    if 1.0 - sims[pos] > self.max_distance:
+                        break
+                    key = self._ids[pos]
+                    entry = self._entries[key]
+                    if entry[2] != tag:
+                        continue
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, embedding, value, tag=None):
+        vector = np.asarray(embedding, dtype="float32").reshape(-1)
+        with self._lock:
+            self._entries[self._next_id] = (vector, value, tag, time.monotonic())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
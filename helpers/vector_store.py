@@ -0,0 +1,110 @@
+# FAISS index creation/loading shared by the builder and the retrievers
+import json
+import math
+from pathlib import Path
+import faiss
+import numpy as np
+
+# Named index specs -> FAISS factory strings (anything else is used as a raw factory string)
+INDEX_SPECS = ["flat", "ivf-flat", "hnsw", "ivf-pq", "sq8"]
+DEFAULT_SEARCH_PARAMS = {
+    "ivf-flat": {"nprobe": 16},
+    "ivf-pq": {"nprobe": 16},
+    "hnsw": {"efSearch": 64},
+}
+# PQ codebooks have 2**8 centroids each, so training needs at least that many vectors
+MIN_TRAIN_POINTS = {"ivf-pq": 256}
+
+def params_path(index_path) -> Path:
+    index_path = Path(index_path)
+    return index_path.with_name(index_path.stem + ".params.json")
+
+def effective_spec(spec: str, n: int) -> str:
+    """Spec actually built for n vectors (0 = not known yet): Flat when there are too few to train."""
+    if n and n < MIN_TRAIN_POINTS.get(spec.lower(), 0):
+        print(f"⚠️ {spec} needs {MIN_TRAIN_POINTS[spec.lower()]}+ vectors to train, got {n}: using flat")
+        return "flat"
+    return spec
+
+def factory_string(spec: str, n: int, dim: int, nlist=None, hnsw_m=32, pq_m=None) -> str:
+    spec = spec.lower()
+    max_nlist = max(1, n // 39)
+    if nlist is None:
+        # Usual sqrt(n) rule, kept small enough to train on n vectors
+        nlist = max(1, min(4096, int(4 * math.sqrt(max(n, 1))), max_nlist))
+    elif n and nlist > max_nlist and spec.startswith("ivf"):
+        print(f"⚠️ nlist {nlist} is too large for {n} vectors: using {max_nlist}")
+        nlist = max_nlist
+    if spec == "flat":
+        return "Flat"
+    if spec == "ivf-flat":
+        return f"IVF{nlist},Flat"
+    if spec == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    if spec == "ivf-pq":
+        return f"IVF{nlist},PQ{pq_m or dim // 8}"
+    if spec == "sq8":
+        return "SQ8"
+    return spec
+
+def apply_search_params(index, search_params):
+    ps = faiss.ParameterSpace()
+    for name, value in (search_params or {}).items():
+        ps.set_index_parameter(index, name, value)
+
+def create_index(spec, n, dim, search_params=None, with_ids=False, **factory_kwargs):
+    """Empty inner-product index sized for n vectors; check is_trained before adding.
+
+    With ids, vectors are stored under int64 ids (IVF natively, others via IndexIDMap2).
+    info["spec"] is the spec actually built (see effective_spec).
+    """
+    spec = effective_spec(spec, n)
+    factory = factory_string(spec, n, dim, **factory_kwargs)
+    index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+    if with_ids and not factory.startswith("IVF"):
+        index = faiss.IndexIDMap2(index)
+    params = dict(DEFAULT_SEARCH_PARAMS.get(spec.lower(), {}))
+    params.update(search_params or {})
+    apply_search_params(index, params)
+    return index, {"spec": spec, "factory": factory, "search_params": params}
+
+def build_index(embeddings, spec="flat", search_params=None, ids=None, **factory_kwargs):
+    """Builds a trained, populated inner-product index for normalized embeddings."""
+    n, dim = embeddings.shape
+    index, info = create_index(spec, n, dim, search_params, with_ids=ids is not None, **factory_kwargs)
+    if not index.is_trained:
+        index.train(embeddings)
+    if ids is None:
+        index.add(embeddings)
+    else:
+        index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+    return index, info
+
+def supports_removal(info) -> bool:
+    # HNSW graphs cannot delete vectors; they are rebuilt instead
+    return not info.get("factory", "").startswith("HNSW")
+
+def id_to_row(vector_ids):
+    """Maps index ids back to metadata rows (-1 for unused ids)."""
+    ids = np.asarray(vector_ids, dtype="int64")
+    lookup = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype="int64")
+    lookup[ids] = np.arange(len(ids))
+    return lookup
+
+def load_index_info(index_path):
+    path = params_path(index_path)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_index(index, index_path, info):
+    faiss.write_index(index, str(index_path))
+    with open(params_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+def load_index(index_path):
+    """Reads any index type; tuning parameters saved next to it are re-applied."""
+    index = faiss.read_index(str(index_path))
+    apply_search_params(index, load_index_info(index_path).get("search_params"))
+    return index
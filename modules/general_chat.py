@@ -1,8 +1,9 @@
 # General module
 import os
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 if not client:
     raise RuntimeError("OPENAI_API_KEY is not set")
 MODEL_NAME = "gpt-4.1-mini"
@@ -18,45 +19,48 @@ def get_relevance(route, module_name):
         if m["module"] == module_name:
             return m["relevance"]
     return 0.0
-def answer_general_query(query,route,mode="module"):
-    if mode == "failsafe":
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": GENERAL_SYSTEM_PROMPT},
-                {"role": "user", "content": query}],temperature=0.6)
-        return {
-            "answer": response.choices[0].message.content.strip(),
-            "has_answer": True,
-            "meta": {"mode": "failsafe"}}
+NO_ANSWER = {
+    "answer": None,
+    "has_answer": False,
+    "meta": {}
+}
+def should_answer(route):
     gen_rel = get_relevance(route, "general")
     rag_rel = get_relevance(route, "railway_rag")
     api_rel = get_relevance(route, "live_data_apis")
     MIN_GENERAL_RELEVANCE = 0.30
     DOMINANCE_MARGIN = 0.10
     if gen_rel < MIN_GENERAL_RELEVANCE:                        #Check 1
-        return {
-            "answer": None,
-            "has_answer": False,
-            "meta": {}
-        }
+        return False
     if gen_rel < max(rag_rel, api_rel) + DOMINANCE_MARGIN:      #Check 2
-        return {
-            "answer": None,
-            "has_answer": False,
-            "meta": {}
-        }
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
+        return False
+    return True
+def general_request(query):
+    return {
+        "model": MODEL_NAME,
+        "messages": [
             {"role": "system", "content": GENERAL_SYSTEM_PROMPT},
             {"role": "user", "content": query}
         ],
-        temperature=0.6
-    )
-    answer_text = response.choices[0].message.content.strip()
+        "temperature": 0.6
+    }
+def general_result(response, mode):
     return {
-        "answer": answer_text,
+        "answer": response.choices[0].message.content.strip(),
         "has_answer": True,
-        "meta": {}
-    }
\ No newline at end of file
+        "meta": {"mode": "failsafe"} if mode == "failsafe" else {}}
+def answer_general_query(query,route,mode="module"):
+    if mode != "failsafe" and not should_answer(route):
+        return dict(NO_ANSWER)
+    response = client.chat.completions.create(**general_request(query))
+    return general_result(response, mode)
+async def aanswer_general_query(query,route,mode="module"):
+    if mode != "failsafe" and not should_answer(route):
+        return dict(NO_ANSWER)
+    response = await aclient.chat.completions.create(**general_request(query))
+    return general_result(response, mode)
+async def astream_general_query(query):
+    stream = await aclient.chat.completions.create(**general_request(query), stream=True)
+    async for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            yield event.choices[0].delta.content
@@ -1,8 +1,10 @@
 # Link only module
 from helpers.live_sources import retrieve_live_sources
-from helpers.live_sources import retrieve_live_sources
-def run(query, num_of_links):
-    sources = retrieve_live_sources(query, top_k=num_of_links)
+def run(query, num_of_links, ctx=None):
+    if ctx:
+        sources = ctx.live_sources(top_k=num_of_links)
+    else:
+        sources = retrieve_live_sources(query, top_k=num_of_links)
     if not sources:
         return []
     return [
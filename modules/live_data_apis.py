@@ -1,16 +1,40 @@
 #APIs
 import os
 import json
+import time
+import random
+import asyncio
+import logging
+import threading
 import requests
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 load_dotenv()
 from datetime import datetime, timezone, timedelta
+from helpers.circuit_breaker import CircuitBreaker
+from helpers.entity_rules import extract_entities
+from helpers.fuzzy_lookup import STATION_SYNONYMS, FuzzyIndex, TrainSearch
+from helpers.response_cache import ResponseCache
 
 with open("data/static_lookup/stations_lookup.json", "r", encoding="utf-8") as f:
     STATION_LOOKUP = json.load(f)
 with open("data/static_lookup/trains_lookup.json", "r", encoding="utf-8") as f:
     TRAIN_LOOKUP = json.load(f)
+# Fuzzy station names (typos, word order, "jn", aliases) resolved locally
+STATION_INDEX_PATH = "data/static_lookup/stations_index.json"
+if os.path.exists(STATION_INDEX_PATH):
+    STATION_INDEX = FuzzyIndex.from_file(STATION_INDEX_PATH, STATION_SYNONYMS)
+else:
+    STATION_INDEX = FuzzyIndex(STATION_LOOKUP, codes=set(STATION_LOOKUP.values()), synonyms=STATION_SYNONYMS)
+# Ranked train name search (names, expansions, endpoint stations), no API calls
+TRAIN_INDEX_PATH = "data/static_lookup/trains_index.json"
+if os.path.exists(TRAIN_INDEX_PATH):
+    TRAIN_SEARCH = TrainSearch.from_file(TRAIN_INDEX_PATH)
+else:
+    TRAIN_SEARCH = TrainSearch.from_lookup(TRAIN_LOOKUP)
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
 if not RAPIDAPI_KEY:
     raise RuntimeError("RAPIDAPI_KEY is not set")
@@ -21,6 +45,30 @@ HEADERS = {
     "x-rapidapi-host": RAPIDAPI_HOST
 }
 llm = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+allm = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
+API_TIMEOUT = (3.05, 10)    # connect, read
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_BACKOFF = 0.3
+API_BREAKER_FAILURES = int(os.getenv("API_BREAKER_FAILURES", "3"))
+API_BREAKER_RESET = float(os.getenv("API_BREAKER_RESET", "30"))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# One keep-alive pool per process (no TCP/TLS handshake per call)
+session = requests.Session()
+session.headers.update(HEADERS)
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=20))
+async_http = httpx.AsyncClient(
+    headers=HEADERS,
+    timeout=httpx.Timeout(API_TIMEOUT[1], connect=API_TIMEOUT[0]),
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+)
+breakers = {}   # API path -> CircuitBreaker
+api_cache = ResponseCache(int(os.getenv("API_CACHE_SIZE", "2048")))
+_refresh_tasks = set()
+# Station lookups and hedged API calls run side by side on these threads
+api_pool = ThreadPoolExecutor(max_workers=int(os.getenv("API_WORKERS", "8")), thread_name_prefix="live-api")
+# Seconds to wait on the primary API before also firing its fallback; 0 = off
+API_HEDGE_DELAY = float(os.getenv("API_HEDGE_DELAY", "0"))
 LLM_MODEL = "gpt-4.1-mini"
 ENTITY_PROMPT = """
 You extract structured railway-related information from user queries.
@@ -72,36 +120,195 @@ Important rules:
 - If multiple values exist, extract all where applicable.
 """
 
-def extract_with_llm(query):    
-    resp = llm.chat.completions.create(
-        model=LLM_MODEL,
-        temperature=0,
-        messages=[
+def entity_request(query):
+    return {
+        "model": LLM_MODEL,
+        "temperature": 0,
+        "messages": [
             {"role": "system", "content": ENTITY_PROMPT},
             {"role": "user", "content": query}
         ]
-    )
+    }
+
+def extract_with_llm(query):    
+    resp = llm.chat.completions.create(**entity_request(query))
     return json.loads(resp.choices[0].message.content)
 
-def call_api(path: str, params):
-    print("\n[API CALL]")
-    print("URL:", BASE_URL + path)
-    print("PARAMS:", params)
+async def aextract_with_llm(query):
+    resp = await allm.chat.completions.create(**entity_request(query))
+    return json.loads(resp.choices[0].message.content)
+
+def handle_response(r):
+    """(data, headers, ok) for requests and httpx responses; ok is False when
+    a 200 body is not the expected JSON object."""
+    logger.debug("API %s -> %s %s", r.url, r.status_code, r.text[:300])
+    if r.status_code != 200:
+        return None, r.headers, True
     try:
-        r = requests.get(
-            BASE_URL + path,
-            headers=HEADERS,
-            params=params,
-            timeout=10
-        )
-        print("STATUS:", r.status_code)
-        print("RESPONSE:", r.text[:300])
-        if r.status_code != 200:
-            return None, r.headers
-        return r.json().get("data"), r.headers
-    except Exception as e:
-        print("❌ API EXCEPTION:", e)
+        return r.json().get("data"), r.headers, True
+    except (ValueError, AttributeError) as e:
+        logger.warning("API %s returned an unreadable body: %s", r.url, e)
+        return None, r.headers, False
+
+def breaker(path):
+    cb = breakers.get(path)
+    if cb is None:
+        cb = breakers.setdefault(path, CircuitBreaker(API_BREAKER_FAILURES, API_BREAKER_RESET))
+    return cb
+
+def backoff_delay(attempt):
+    # Full jitter: uniform in [0, base * 2^attempt]
+    return random.uniform(0, API_BACKOFF * 2 ** attempt)
+
+class ApiAttempts:
+    """Breaker and retry bookkeeping for one API call, shared by call_api and acall_api.
+
+    The callers only do the I/O: sleep for each delay(), make the request and
+    report it with failed() or answered(); both return True when to stop.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.cb = breaker(path)
+        self.attempt = 0
+        self.response = None
+        self.result = None
+
+    def allowed(self) -> bool:
+        if self.cb.allow():
+            return True
+        logger.warning("API %s skipped: circuit open", self.path)
+        return False
+
+    def delays(self):
+        # Seconds to wait before each attempt (none before the first)
+        for attempt in range(API_RETRIES + 1):
+            self.attempt = attempt
+            yield backoff_delay(attempt) if attempt else 0
+
+    def failed(self, error, timed_out=False) -> bool:
+        if timed_out:
+            logger.warning("API %s timed out: %s", self.path, error)
+            return True
+        logger.warning("API %s failed (attempt %d): %s", self.path, self.attempt + 1, error)
+        return False
+
+    def answered(self, r) -> bool:
+        self.response = r
+        if r.status_code in RETRY_STATUS:
+            logger.warning("API %s returned %s (attempt %d)", self.path, r.status_code, self.attempt + 1)
+            return False
+        data, headers, ok = handle_response(r)
+        if ok:
+            self.cb.record_success()
+        else:
+            self.cb.record_failure()
+        self.result = (data, headers)
+        return True
+
+    def outcome(self):
+        if self.result is not None:
+            return self.result
+        self.cb.record_failure()
+        return None, self.response.headers if self.response is not None else None
+
+# Pooled keep-alive calls with bounded retries; an endpoint whose breaker is
+# open fails at once so the caller's fallback runs without waiting. A read
+# timeout is not retried (the endpoint is slow, not flaky).
+def call_api(path: str, params):
+    attempts = ApiAttempts(path)
+    if not attempts.allowed():
         return None, None
+    for delay in attempts.delays():
+        time.sleep(delay)
+        try:
+            r = session.get(BASE_URL + path, params=params, timeout=API_TIMEOUT)
+        except requests.RequestException as e:
+            if attempts.failed(e, isinstance(e, requests.ReadTimeout)):
+                break
+            continue
+        if attempts.answered(r):
+            break
+    return attempts.outcome()
+
+async def acall_api(path: str, params):
+    attempts = ApiAttempts(path)
+    if not attempts.allowed():
+        return None, None
+    for delay in attempts.delays():
+        await asyncio.sleep(delay)
+        try:
+            r = await async_http.get(BASE_URL + path, params=params)
+        except httpx.HTTPError as e:
+            if attempts.failed(e, isinstance(e, httpx.ReadTimeout)):
+                break
+            continue
+        if attempts.answered(r):
+            break
+    return attempts.outcome()
+
+# Response cache in front of call_api: TTLs come from INTENT_TO_API ("ttl" =
+# served as fresh, "stale_ttl" = served as stale while refreshed in the background)
+def cache_policy(intent):
+    api = INTENT_TO_API.get(intent, {})
+    return api.get("ttl", 0), api.get("stale_ttl", 0)
+
+def refresh_cached(key, path, params):
+    try:
+        data, headers = call_api(path, params)
+        api_cache.store(key, data, headers)
+    finally:
+        api_cache.end_refresh(key)
+
+async def arefresh_cached(key, path, params):
+    try:
+        data, headers = await acall_api(path, params)
+        api_cache.store(key, data, headers)
+    finally:
+        api_cache.end_refresh(key)
+
+def cache_lookup(key, ttl, stale_ttl):
+    """(state, cached, refresh): fresh/stale entries are answered from cache,
+    refresh says this caller should start the background refresh."""
+    state, data, headers = api_cache.lookup(key, ttl, stale_ttl)
+    refresh = state == "stale" and api_cache.start_refresh(key)
+    return state, (data, headers), refresh
+
+def cache_fetched(key, state, cached, fetched):
+    # API down: an expired answer (labeled stale) beats none
+    if not fetched[0] and state == "expired":
+        return cached
+    api_cache.store(key, *fetched)
+    return fetched
+
+def cached_api(intent):
+    ttl, stale_ttl = cache_policy(intent)
+    if not ttl:
+        return call_api
+    def call(path, params):
+        key = api_cache.key(path, params)
+        state, cached, refresh = cache_lookup(key, ttl, stale_ttl)
+        if refresh:
+            threading.Thread(target=refresh_cached, args=(key, path, params), daemon=True).start()
+        if state in ("fresh", "stale"):
+            return cached
+        return cache_fetched(key, state, cached, call_api(path, params))
+    return call
+
+def acached_api(intent):
+    ttl, stale_ttl = cache_policy(intent)
+    if not ttl:
+        return acall_api
+    async def call(path, params):
+        key = api_cache.key(path, params)
+        state, cached, refresh = cache_lookup(key, ttl, stale_ttl)
+        if refresh:
+            task = asyncio.create_task(arefresh_cached(key, path, params))
+            _refresh_tasks.add(task)
+            task.add_done_callback(_refresh_tasks.discard)
+        if state in ("fresh", "stale"):
+            return cached
+        return cache_fetched(key, state, cached, await acall_api(path, params))
+    return call
 
 def resolve_train_number(value: str):
     if not value:
@@ -109,20 +316,44 @@ def resolve_train_number(value: str):
     clean = value.lower().strip()
     if clean.isdigit() and len(clean) == 5:
         return clean
-    return TRAIN_LOOKUP.get(clean)
-def resolve_station_code_local(name: str):
-    if not name:
-        return None
+    if clean in TRAIN_LOOKUP:
+        return TRAIN_LOOKUP[clean]
+    return TRAIN_SEARCH.best(value)
+def lookup_station_code(name: str):
     clean = name.lower().strip()
     if clean in STATION_LOOKUP:
         return STATION_LOOKUP[clean]
-    return resolve_station_code(name)
+    return STATION_INDEX.lookup(name)
+def resolve_station_codes(names):
+    # name -> code; searchStation API only when the local index has no confident
+    # match, and those lookups run concurrently
+    codes = {n: lookup_station_code(n) if n else None for n in dict.fromkeys(names)}
+    remote = [n for n, code in codes.items() if n and not code]
+    if len(remote) == 1:
+        codes[remote[0]] = resolve_station_code(remote[0])
+    elif remote:
+        codes.update(zip(remote, api_pool.map(resolve_station_code, remote)))
+    return codes
+async def aresolve_station_codes(names):
+    codes = {n: lookup_station_code(n) if n else None for n in dict.fromkeys(names)}
+    remote = [n for n, code in codes.items() if n and not code]
+    codes.update(zip(remote, await asyncio.gather(*(aresolve_station_code(n) for n in remote))))
+    return codes
 
 def resolve_station_code(name: str):
     if not name:
         return None
     clean = name.lower().replace(" station", "").strip()
-    data, _ = call_api("/api/v1/searchStation", {"query": clean})
+    data, _ = cached_api("search_station")("/api/v1/searchStation", {"query": clean})
+    return pick_station_code(data, clean)
+async def aresolve_station_code(name: str):
+    if not name:
+        return None
+    clean = name.lower().replace(" station", "").strip()
+    data, _ = await acached_api("search_station")("/api/v1/searchStation", {"query": clean})
+    return pick_station_code(data, clean)
+
+def pick_station_code(data, clean):
     if not data:
         return None
     for s in data:
@@ -139,6 +370,12 @@ def resolve_station_code(name: str):
 def determine_freshness(headers):
     if not headers:
         return "unknown"    
+    # Cached responses: fresh within their intent's TTL, stale after it
+    cache_state = headers.get("X-Cache")
+    if cache_state == "hit":
+        return "fresh"
+    if cache_state == "stale":
+        return "stale"
     date_header = headers.get("Date")
     if not date_header:
         return "unknown"
@@ -164,31 +401,31 @@ def normalize_date_for_api(date_str):
 
 #APIs
 
-def get_train_live_status(e):
-    return call_api("/api/v1/liveTrainStatus", {"trainNo": e["train_number"]})
-def get_train_schedule(e):
-    return call_api("/api/v1/getTrainSchedule", {"trainNo": e["train_number"]})
-def get_trains_between_stations(e):
-    return call_api("/api/v3/trainBetweenStations", {
+def get_train_live_status(e, call=call_api):
+    return call("/api/v1/liveTrainStatus", {"trainNo": e["train_number"]})
+def get_train_schedule(e, call=call_api):
+    return call("/api/v1/getTrainSchedule", {"trainNo": e["train_number"]})
+def get_trains_between_stations(e, call=call_api):
+    return call("/api/v3/trainBetweenStations", {
         "fromStationCode": e["from_station"],
         "toStationCode": e["to_station"],
         "dateOfJourney": e["date"]
     })
-def get_pnr_status(e):
-    return call_api("/api/v3/getPNRStatus", {"pnrNumber": e["pnr"]})
-def get_live_station(e):
-    return call_api("/api/v3/getLiveStation", {
+def get_pnr_status(e, call=call_api):
+    return call("/api/v3/getPNRStatus", {"pnrNumber": e["pnr"]})
+def get_live_station(e, call=call_api):
+    return call("/api/v3/getLiveStation", {
         "fromStationCode": e["station_code"],
         "hours": e.get("hours", 2)
     })
-def get_trains_by_station(e):
-    return call_api("/api/v3/getTrainsByStation", {"stationCode": e["station_code"]})
-def search_train(e):
-    return call_api("/api/v1/searchTrain", {"query": e["query"]})
-def search_station(e):
-    return call_api("/api/v1/searchStation", {"query": e["query"]})
-def get_seat_availability(e):
-    return call_api("/api/v1/checkSeatAvailability", {
+def get_trains_by_station(e, call=call_api):
+    return call("/api/v3/getTrainsByStation", {"stationCode": e["station_code"]})
+def search_train(e, call=call_api):
+    return call("/api/v1/searchTrain", {"query": e["query"]})
+def search_station(e, call=call_api):
+    return call("/api/v1/searchStation", {"query": e["query"]})
+def get_seat_availability(e, call=call_api):
+    return call("/api/v1/checkSeatAvailability", {
         "trainNo": e["train_number"],
         "fromStationCode": e["from_station"],
         "toStationCode": e["to_station"],
@@ -196,8 +433,8 @@ def get_seat_availability(e):
         "classType": e["class_type"],
         "quota": e.get("quota", "GN")
     })
-def get_seat_availability_v2(e):
-    return call_api("/api/v2/checkSeatAvailability", {
+def get_seat_availability_v2(e, call=call_api):
+    return call("/api/v2/checkSeatAvailability", {
         "trainNo": e["train_number"],
         "fromStationCode": e["from_station"],
         "toStationCode": e["to_station"],
@@ -205,8 +442,8 @@ def get_seat_availability_v2(e):
         "classType": e["class_type"],
         "quota": e.get("quota", "GN")
     })
-def get_fare(e):
-    return call_api("/api/v1/getFare", {
+def get_fare(e, call=call_api):
+    return call("/api/v1/getFare", {
         "trainNo": e["train_number"],
         "fromStationCode": e["from_station"],
         "toStationCode": e["to_station"],
@@ -221,89 +458,123 @@ def get_fare(e):
 # Calling crct API
 # Mapping intent to API
 
+# ttl / stale_ttl: seconds a cached response is served as fresh / as stale
 INTENT_TO_API = {
     "train_live_status": {
         "required": ["train_number"],
         "handler": get_train_live_status,
-        "fallback": "train_schedule"
+        "fallback": "train_schedule",
+        "ttl": 60,
+        "stale_ttl": 240
     },
     "train_schedule": {
         "required": ["train_number"],
         "handler": get_train_schedule,
-        "fallback": None
+        "fallback": None,
+        "ttl": 86400,
+        "stale_ttl": 86400
     },
     "trains_between_stations": {
         "required": ["from_station", "to_station", "date"],
         "handler": get_trains_between_stations,
-        "fallback": None
+        "fallback": None,
+        "ttl": 21600,
+        "stale_ttl": 21600
     },
     "seat_availability": {
         "required": ["train_number", "from_station", "to_station", "date", "class_type"],
         "handler": get_seat_availability,
-        "fallback": "seat_availability_v2"
+        "fallback": "seat_availability_v2",
+        "ttl": 300,
+        "stale_ttl": 300
     },
     "seat_availability_v2": {
         "required": ["train_number", "from_station", "to_station", "date", "class_type"],
         "handler": get_seat_availability_v2,
-        "fallback": None
+        "fallback": None,
+        "ttl": 300,
+        "stale_ttl": 300
     },
     "fare_enquiry": {
         "required": ["train_number", "from_station", "to_station", "date", "class_type"],
         "handler": get_fare,
-        "fallback": None
+        "fallback": None,
+        "ttl": 21600,
+        "stale_ttl": 21600
     },
     "pnr_status": {
         "required": ["pnr"],
         "handler": get_pnr_status,
-        "fallback": None
+        "fallback": None,
+        "ttl": 120,
+        "stale_ttl": 0
     },
     "live_station": {
         "required": ["station_code"],
         "handler": get_live_station,
-        "fallback": "trains_by_station"
+        "fallback": "trains_by_station",
+        "ttl": 60,
+        "stale_ttl": 240
     },
     "trains_by_station": {
         "required": ["station_code"],
         "handler": get_trains_by_station,
-        "fallback": None
+        "fallback": None,
+        "ttl": 86400,
+        "stale_ttl": 86400
     },
     "search_train": {
         "required": ["query"],
         "handler": search_train,
-        "fallback": None
+        "fallback": None,
+        "ttl": 604800,
+        "stale_ttl": 604800
     },
     "search_station": {
         "required": ["query"],
         "handler": search_station,
-        "fallback": None
+        "fallback": None,
+        "ttl": 604800,
+        "stale_ttl": 604800
     }
 }
 
 # Main
 
-def answer_with_live_data(query):
-    parsed = extract_with_llm(query)
-    intent = parsed.get("intent", "unknown")
-    if intent not in INTENT_TO_API:
-        return {"answer": None, "has_answer": False, "meta": {"status":"nothing"}}
+def station_names(parsed):
+    # Every station name that needs a code (resolved before the entity is built)
+    names = list(parsed.get("stations", []))
+    journey = parsed.get("journey")
+    if journey and journey.get("from") and journey.get("to"):
+        names += [journey["from"], journey["to"]]
+    return names
+
+def build_entity(query, parsed, intent, codes, guess_train=True):
+    # codes: station name -> resolved code (or None); guess_train: fill a
+    # missing train number from a fuzzy name match
     entity = {"query": query}
     if parsed.get("train_numbers"):
         tn = resolve_train_number(parsed["train_numbers"][0])
         if tn:
             entity["train_number"] = tn
+    if guess_train and "train_number" not in entity and "train_number" in INTENT_TO_API[intent]["required"]:
+        # Train named instead of numbered ("rajdhani from howrah")
+        tn = TRAIN_SEARCH.best(query)
+        if tn:
+            entity["train_number"] = tn
     if parsed.get("pnr_numbers"):
         entity["pnr"] = parsed["pnr_numbers"][0]
     resolved = []
     for s in parsed.get("stations", []):
-        code = resolve_station_code_local(s)
+        code = codes.get(s)
         if code:
             resolved.append(code)
     if len(resolved) == 1:
         entity["station_code"] = resolved[0]
     journey = parsed.get("journey")
     if journey and journey.get("from") and journey.get("to"):
-        f = resolve_station_code_local(journey["from"])
-        t = resolve_station_code_local(journey["to"])
+        f = codes.get(journey["from"])
+        t = codes.get(journey["to"])
         if f and t:
             entity["from_station"] = f
             entity["to_station"] = t
@@ -316,32 +587,127 @@ def answer_with_live_data(query):
     for k in ["class_type", "quota", "hours"]:
         if parsed.get(k) is not None:
             entity[k] = parsed[k]
-    api = INTENT_TO_API[intent]
+    return entity
+
+def missing_input_result(intent, entity):
     # required, missing
-    required = api["required"]
+    required = INTENT_TO_API[intent]["required"]
     missing = [k for k in required if k not in entity]
-    if missing:
-        return {
-            "answer": None,
-            "has_answer": False,
-            "meta": {
-                "status": "need_input",
-                "reason": "missing_required_fields",
-                "intent": intent,
-                "missing_fields": missing,
-                "partial_entity": entity
-            }
+    if not missing:
+        return None
+    result = {
+        "answer": None,
+        "has_answer": False,
+        "meta": {
+            "status": "need_input",
+            "reason": "missing_required_fields",
+            "intent": intent,
+            "missing_fields": missing,
+            "partial_entity": entity
         }
-    # Primary API call
-    data, headers= api["handler"](entity)
-    fallback_used = False
-    # Fallback handling
-    if not data and api.get("fallback"):
-        fb = INTENT_TO_API[api["fallback"]]
-        if all(k in entity for k in fb["required"]):
-            data, headers= fb["handler"](entity)
-            if data:
-                fallback_used = True
+    }
+    if "train_number" in missing:
+        # Ambiguous train name: offer the ranked local matches
+        candidates = TRAIN_SEARCH.candidates(entity.get("query", ""))
+        if candidates:
+            result["meta"]["candidates"] = candidates
+    return result
+
+def completeness(intent, entity):
+    # Share of the intent's required fields present in the entity
+    required = INTENT_TO_API[intent]["required"]
+    return sum(k in entity for k in required) / len(required)
+
+def local_entities(query):
+    """Rule-based extraction (no LLM, no API calls): (parsed, entity, completeness)."""
+    parsed = extract_entities(query, STATION_INDEX)
+    intent = parsed["intent"]
+    if intent not in INTENT_TO_API:
+        return parsed, None, 0.0
+    codes = {n: lookup_station_code(n) for n in station_names(parsed)}
+    # Only a typed train number counts here: a name match is a guess for the LLM to confirm
+    entity = build_entity(query, parsed, intent, codes, guess_train=False)
+    score = completeness(intent, entity)
+    logger.debug("rule entities %s -> %s (completeness %.2f)", query, entity, score)
+    return parsed, entity, score
+
+def fallback_api(intent, entity):
+    # Fallback intent when the entity has all its inputs
+    fb = INTENT_TO_API[intent].get("fallback")
+    if fb and all(k in entity for k in INTENT_TO_API[fb]["required"]):
+        return fb
+    return None
+
+def run_intent(intent, entity):
+    return INTENT_TO_API[intent]["handler"](entity, call=cached_api(intent))
+
+async def arun_intent(intent, entity):
+    return await INTENT_TO_API[intent]["handler"](entity, call=acached_api(intent))
+
+def fallback_plan(intent, entity):
+    # (fallback intent or None, hedge it?)
+    fb = fallback_api(intent, entity)
+    return fb, bool(fb) and API_HEDGE_DELAY > 0
+
+def with_fallback(primary, fallback=None):
+    # (data, headers, fallback_used): the fallback only counts when it has data
+    if fallback and fallback[0]:
+        return (*fallback, True)
+    return (*primary, False)
+
+def hedge_winner(finished, fallback):
+    # First finished future/task with data, as (data, headers, fallback_used)
+    for f in finished:
+        if f.result()[0]:
+            return (*f.result(), f is fallback)
+    return None
+
+def run_with_fallback(intent, entity):
+    """(data, headers, fallback_used): fallback after the primary fails, or
+    hedged (API_HEDGE_DELAY) where the first good response wins."""
+    fb, hedged = fallback_plan(intent, entity)
+    if not hedged:
+        primary = run_intent(intent, entity)
+        return with_fallback(primary, run_intent(fb, entity) if fb and not primary[0] else None)
+    primary = api_pool.submit(run_intent, intent, entity)
+    done, _ = wait([primary], timeout=API_HEDGE_DELAY)
+    winner = hedge_winner(done, None)
+    if winner:
+        return winner
+    fallback = api_pool.submit(run_intent, fb, entity)
+    pending = {primary, fallback}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        # The loser keeps running; its response still lands in the cache
+        winner = hedge_winner(done, fallback)
+        if winner:
+            return winner
+    return with_fallback(primary.result())
+
+async def arun_with_fallback(intent, entity):
+    fb, hedged = fallback_plan(intent, entity)
+    if not hedged:
+        primary = await arun_intent(intent, entity)
+        return with_fallback(primary, await arun_intent(fb, entity) if fb and not primary[0] else None)
+    primary = asyncio.create_task(arun_intent(intent, entity))
+    done, _ = await asyncio.wait({primary}, timeout=API_HEDGE_DELAY)
+    winner = hedge_winner(done, None)
+    if winner:
+        return winner
+    fallback = asyncio.create_task(arun_intent(fb, entity))
+    pending = {primary, fallback}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = hedge_winner(done, fallback)
+            if winner:
+                return winner
+        return with_fallback(primary.result())
+    finally:
+        for task in pending:
+            task.cancel()
+
+def live_result(intent, entity, data, headers, fallback_used):
     # Freshness detection (safe, signal only)
     freshness = determine_freshness(headers)
     if not data:
@@ -363,6 +729,45 @@ def answer_with_live_data(query):
             }
         }
     }
+
+def answer_with_live_data(query, parsed=None):
+    # parsed: entities already extracted upstream (fused router), same schema as ENTITY_PROMPT
+    entity = None
+    if parsed is None:
+        # LLM only when the rules cannot fill every required field
+        parsed, entity, score = local_entities(query)
+        if score < 1.0:
+            parsed, entity = extract_with_llm(query), None
+    intent = parsed.get("intent", "unknown")
+    if intent not in INTENT_TO_API:
+        return {"answer": None, "has_answer": False, "meta": {"status":"nothing"}}
+    if entity is None:
+        codes = resolve_station_codes(station_names(parsed))
+        entity = build_entity(query, parsed, intent, codes)
+    need_input = missing_input_result(intent, entity)
+    if need_input:
+        return need_input
+    # Primary API call, fallback (or hedge) when it has no data
+    data, headers, fallback_used = run_with_fallback(intent, entity)
+    return live_result(intent, entity, data, headers, fallback_used)
+
+async def aanswer_with_live_data(query, parsed=None):
+    entity = None
+    if parsed is None:
+        parsed, entity, score = local_entities(query)
+        if score < 1.0:
+            parsed, entity = await aextract_with_llm(query), None
+    intent = parsed.get("intent", "unknown")
+    if intent not in INTENT_TO_API:
+        return {"answer": None, "has_answer": False, "meta": {"status":"nothing"}}
+    if entity is None:
+        codes = await aresolve_station_codes(station_names(parsed))
+        entity = build_entity(query, parsed, intent, codes)
+    need_input = missing_input_result(intent, entity)
+    if need_input:
+        return need_input
+    data, headers, fallback_used = await arun_with_fallback(intent, entity)
+    return live_result(intent, entity, data, headers, fallback_used)
 #TEST
 # if __name__ == "__main__":
 #     print("=" * 80)
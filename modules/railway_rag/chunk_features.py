@@ -0,0 +1,54 @@
+# Per-chunk re-ranking features, computed once (at vector store build time)
+import numpy as np
+
+# Bit per question type, set when the chunk text contains one of its keywords
+KEYWORD_CLASSES = {
+    "definition": ["means", "defined as"],
+    "permission": ["may", "permitted", "allowed"],
+    "prohibition": ["shall not", "prohibited"],
+    "procedure": ["procedure", "steps", "shall be"],
+    "penalty": ["penalty", "fine", "liable"],
+}
+QUESTION_TYPE_BITS = {name: bit for bit, name in enumerate(KEYWORD_CLASSES)}
+
+def recency_score(year):
+    if year is None:
+        return 0.0
+    return min((year - 2000) / 25, 1.0)
+
+def keyword_mask(text: str) -> int:
+    t = (text or "").lower()
+    mask = 0
+    for name, words in KEYWORD_CLASSES.items():
+        if any(x in t for x in words):
+            mask |= 1 << QUESTION_TYPE_BITS[name]
+    return mask
+
+def compute_chunk_features(metadata):
+    """Arrays aligned with metadata rows (any iterable); rule_types[0] is the empty (no rule type) entry."""
+    rule_types = [""]
+    rule_type_ids = {"": 0}
+    priority_weight, recency, rule_type_id, mask = [], [], [], []
+    for meta in metadata:
+        priority_weight.append(1 / meta["priority"] if meta.get("priority") else 0.0)
+        recency.append(recency_score(meta.get("effective_year")))
+        rt = meta.get("rule_type") or ""
+        if rt not in rule_type_ids:
+            rule_type_ids[rt] = len(rule_types)
+            rule_types.append(rt)
+        rule_type_id.append(rule_type_ids[rt])
+        mask.append(keyword_mask(meta.get("text")))
+    return {
+        "priority_weight": np.array(priority_weight, dtype="float64"),
+        "recency": np.array(recency, dtype="float64"),
+        "rule_type_id": np.array(rule_type_id, dtype="int32"),
+        "rule_types": np.array(rule_types, dtype=str),
+        "keyword_mask": np.array(mask, dtype="uint8"),
+    }
+
+def save_chunk_features(path, features):
+    np.savez(path, **features)
+
+def load_chunk_features(path):
+    with np.load(path) as data:
+        return {k: data[k] for k in data.files}
@@ -1,13 +1,27 @@
 # Railway Rules RAG Module
 import os
-from openai import OpenAI
+import copy
+import asyncio
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 load_dotenv()
-from modules.railway_rag.retrieval_engine import retrieve_rules
+from helpers.embeddings import encode_query
+from helpers.semantic_cache import SemanticCache
+from modules.railway_rag.retrieval_engine import INDEX_VERSION, retrieve_rules
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 if not client:
     raise RuntimeError("OPENAI_API_KEY is not set")
 MODEL_NAME = "gpt-4.1-mini"
+# Answer cache: a near-duplicate question over the same retrieved chunks reuses the answer
+ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("RAG_CACHE_MAX_DISTANCE", "0.05"))
+ANSWER_CACHE_TTL = int(os.getenv("RAG_CACHE_TTL", "86400"))
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "1024"))
+answer_cache = SemanticCache(
+    max_entries=ANSWER_CACHE_SIZE,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    max_distance=ANSWER_CACHE_MAX_DISTANCE
+)
 SYSTEM_PROMPT = (
     "You are a railway rules assistant.\n"
     "You must answer the user question ONLY if the provided railway rules, clearly and directly contain the answer.\n"
@@ -65,14 +79,13 @@ def estimate_confidence(chunks):    #Find Confidence
     )
     return round(min(confidence, 0.9), 2)
 
-def answer_with_rag(query: str):
-    chunks = retrieve_rules(query)
-    if not chunks:  # No chunks
-        return {
-            "answer": None,
-            "has_answer": False,
-            "meta": {"confidence": 0.0,}
-        }
+NO_CHUNKS = {
+    "answer": None,
+    "has_answer": False,
+    "meta": {"confidence": 0.0,}
+}
+
+def rag_request(query, chunks):
     context=build_context(chunks)
     user_prompt=(
         f"User question:\n{query}\n\n"
@@ -81,15 +94,16 @@ def answer_with_rag(query: str):
         "- Answer strictly using the rules above.\n"
         "- Do not add external knowledge.\n"
     )
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
+    return {
+        "model": MODEL_NAME,
+        "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt}
         ],
-        temperature=0.2
-    )
-    answer_text = response.choices[0].message.content.strip()
+        "temperature": 0.2
+    }
+
+def rag_result(chunks, answer_text):
     confidence=estimate_confidence(chunks)
     if not answer_text:
         return {
@@ -108,5 +122,69 @@ def answer_with_rag(query: str):
             "rule_types": list({c.get("rule_type") for c in chunks if c.get("rule_type")})
         }
     }
+
+def evidence_tag(chunks):
+    # Same index build and same retrieved chunks (in any order)
+    return (INDEX_VERSION, tuple(sorted(c.get("chunk_id") or "" for c in chunks)))
+
+def cached_answer(query_embedding, chunks):
+    result = answer_cache.get(query_embedding, tag=evidence_tag(chunks))
+    return copy.deepcopy(result) if result else None
+
+def remember_answer(query_embedding, chunks, result):
+    if result.get("answer"):
+        answer_cache.put(query_embedding, copy.deepcopy(result), tag=evidence_tag(chunks))
+
+def answer_with_rag(query: str, ctx=None):
+    if ctx:
+        embedding, chunks = ctx.embedding, ctx.rules()
+    else:
+        embedding = encode_query(query)
+        chunks = retrieve_rules(query, query_embedding=embedding)
+    if not chunks:  # No chunks
+        return dict(NO_CHUNKS)
+    cached = cached_answer(embedding, chunks)
+    if cached:
+        return cached
+    response = client.chat.completions.create(**rag_request(query, chunks))
+    answer_text = response.choices[0].message.content.strip()
+    result = rag_result(chunks, answer_text)
+    remember_answer(embedding, chunks, result)
+    return result
+
+async def aanswer_with_rag(query: str, ctx=None):
+    # Retrieval is CPU-bound, keep it off the event loop
+    if ctx:
+        embedding = await ctx.aembedding()
+        chunks = await ctx.arules()
+    else:
+        embedding = await asyncio.to_thread(encode_query, query)
+        chunks = await asyncio.to_thread(retrieve_rules, query, embedding)
+    if not chunks:
+        return dict(NO_CHUNKS)
+    cached = cached_answer(embedding, chunks)
+    if cached:
+        return cached
+    response = await aclient.chat.completions.create(**rag_request(query, chunks))
+    answer_text = response.choices[0].message.content.strip()
+    result = rag_result(chunks, answer_text)
+    remember_answer(embedding, chunks, result)
+    return result
+# Yields answer tokens as they arrive (chunks already retrieved by the caller);
+# a cached answer comes back as a single token
+async def astream_with_rag(query: str, chunks, query_embedding=None):
+    if query_embedding is not None:
+        cached = cached_answer(query_embedding, chunks)
+        if cached:
+            yield cached["answer"]
+            return
+    tokens = []
+    stream = await aclient.chat.completions.create(**rag_request(query, chunks), stream=True)
+    async for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            tokens.append(event.choices[0].delta.content)
+            yield event.choices[0].delta.content
+    if query_embedding is not None:
+        remember_answer(query_embedding, chunks, rag_result(chunks, "".join(tokens).strip()))
 if __name__ == "__main__":
     print("✅ Railway base RAG module ready.")
\ No newline at end of file
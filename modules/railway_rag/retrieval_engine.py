@@ -1,8 +1,14 @@
 #Helps railwaay_base_rag 
-import json
 from pathlib import Path
-import faiss
-from sentence_transformers import SentenceTransformer
+import numpy as np
+from helpers.embeddings import encode_query
+from helpers.chunk_store import ChunkStore
+from helpers.vector_store import id_to_row, load_index
+from modules.railway_rag.chunk_features import (
+    QUESTION_TYPE_BITS,
+    compute_chunk_features,
+    load_chunk_features,
+)
 
 TOP_K_RETRIEVE = 50
 TOP_K_FINAL = 10
@@ -14,22 +20,30 @@ QUESTION_TYPE_WEIGHT = 0.10
 DATA_DIR = Path("data")
 VECTOR_DIR = DATA_DIR / "vector_store"
 RULES_FAISS_INDEX_PATH = VECTOR_DIR / "rules_faiss.index"
-RULES_METADATA_PATH = VECTOR_DIR / "rules_metadata.json"
-index = faiss.read_index(str(RULES_FAISS_INDEX_PATH))
-with open(RULES_METADATA_PATH, "r", encoding="utf-8") as f:
-    METADATA = json.load(f)
-model = SentenceTransformer("all-MiniLM-L6-v2")
+RULES_METADATA_PATH = VECTOR_DIR / "rules_metadata"
+RULES_FEATURES_PATH = VECTOR_DIR / "rules_features.npz"
+index = load_index(RULES_FAISS_INDEX_PATH)
+# Columns are memory-mapped; only the rows a query returns are decoded
+METADATA = ChunkStore(RULES_METADATA_PATH)
 assert index.ntotal == len(METADATA), "Index and metadata size mismatch"
+# Index ids are stable vector_ids (incremental builds), not row numbers
+ROW_BY_ID = id_to_row(METADATA.column("vector_id"))
+# Changes with every rebuild of the loaded index (tags cached answers)
+_index_stat = RULES_FAISS_INDEX_PATH.stat()
+INDEX_VERSION = f"{_index_stat.st_mtime_ns:x}-{_index_stat.st_size:x}-{len(METADATA)}"
+RESULT_FIELDS = [
+    "chunk_id", "document_path", "rule_type", "priority", "authority", "page_number", "section_index", "text"
+]
+
+# Precomputed per-chunk features (rebuilt from metadata if the file is missing/outdated)
+if RULES_FEATURES_PATH.exists():
+    FEATURES = load_chunk_features(RULES_FEATURES_PATH)
+else:
+    FEATURES = compute_chunk_features(METADATA)
+if len(FEATURES["recency"]) != len(METADATA):
+    FEATURES = compute_chunk_features(METADATA)
 
 #Scoring helpers
-def rule_match_score(query: str, rule_type: str) -> float:
-    if not rule_type:
-        return 0.0
-    return 1.0 if rule_type.lower() in query.lower() else 0.0
-def recency_score(year):
-    if year is None:
-        return 0.0
-    return min((year - 2000) / 25, 1.0)
 def detect_question_type(query: str) -> str:
     q = query.lower()
     if any(x in q for x in ["what is", "define", "meaning of"]):
@@ -43,57 +57,43 @@ def detect_question_type(query: str) -> str:
     if any(x in q for x in ["penalty", "fine", "punishment", "liable"]):
         return "penalty"
     return "general"
-def question_type_bonus(qtype: str, text: str) -> float:
-    t = text.lower()
-    if qtype == "definition" and any(x in t for x in ["means", "defined as"]):
-        return QUESTION_TYPE_WEIGHT
-    if qtype == "permission" and any(x in t for x in ["may", "permitted", "allowed"]):
-        return QUESTION_TYPE_WEIGHT
-    if qtype == "prohibition" and any(x in t for x in ["shall not", "prohibited"]):
-        return QUESTION_TYPE_WEIGHT
-    if qtype == "procedure" and any(x in t for x in ["procedure", "steps", "shall be"]):
-        return QUESTION_TYPE_WEIGHT
-    if qtype == "penalty" and any(x in t for x in ["penalty", "fine", "liable"]):
-        return QUESTION_TYPE_WEIGHT
-    return 0.0
-
 
-def retrieve_rules(query: str):
-    query_embedding = model.encode(
-        [query],
-        normalize_embeddings=True,
-        convert_to_numpy=True
-    )
+def retrieve_rules(query: str, query_embedding=None):
+    if query_embedding is None:
+        query_embedding = encode_query(query)
     scores, indices = index.search(query_embedding, TOP_K_RETRIEVE)
-    qtype = detect_question_type(query)
+    sims = scores[0].astype("float64")
+    keep = (indices[0] >= 0) & (sims >= SIMILARITY_THRESHOLD)
+    sims = sims[keep]
+    rows = ROW_BY_ID[indices[0][keep]]
+    if not len(rows):
+        return []
+    # All bonuses are lookups into the precomputed arrays
+    rule_matches = np.array([bool(rt) and rt.lower() in query.lower() for rt in FEATURES["rule_types"]])
+    final_scores = (
+        sims
+        + FEATURES["priority_weight"][rows] * PRIORITY_WEIGHT
+        + rule_matches[FEATURES["rule_type_id"][rows]] * RULE_MATCH_WEIGHT
+        + FEATURES["recency"][rows] * RECENCY_WEIGHT
+    )
+    bit = QUESTION_TYPE_BITS.get(detect_question_type(query))
+    if bit is not None:
+        final_scores += (FEATURES["keyword_mask"][rows] >> bit & 1) * QUESTION_TYPE_WEIGHT
+    final_scores = np.round(final_scores, 4)
+    order = np.argsort(-final_scores, kind="stable")[:TOP_K_FINAL]
     candidates = []
-    for i, idx in enumerate(indices[0]):
-        similarity = float(scores[0][i])
-        if similarity < SIMILARITY_THRESHOLD:
-            continue
-        meta = METADATA[idx]
-        priority_bonus = (1 / meta["priority"]) * PRIORITY_WEIGHT
-        rule_bonus = rule_match_score(query, meta["rule_type"]) * RULE_MATCH_WEIGHT
-        recency_bonus = recency_score(meta.get("effective_year")) * RECENCY_WEIGHT
-        qtype_bonus = question_type_bonus(qtype, meta["text"])
-        final_score = (
-            similarity
-            + priority_bonus
-            + rule_bonus
-            + recency_bonus
-            + qtype_bonus
-        )
+    for pos in order:
+        meta = METADATA.row(rows[pos], RESULT_FIELDS)
         candidates.append({
-            "final_score": round(final_score, 4),
-            "similarity": round(similarity, 4),
+            "final_score": float(final_scores[pos]),
+            "similarity": round(float(sims[pos]), 4),
             "chunk_id": meta["chunk_id"],
             "document_path": meta["document_path"],
             "rule_type": meta["rule_type"],
             "priority": meta["priority"],
             "authority": meta["authority"],
             "page_number": meta["page_number"],
-            "section_index": meta.get("section_index"),
+            "section_index": meta["section_index"],
             "text": meta["text"]
         })
-    candidates.sort(key=lambda x: x["final_score"], reverse=True)
-    return candidates[:TOP_K_FINAL]
\ No newline at end of file
+    return candidates